@@ -1,95 +1,217 @@
+import argparse
 import geopandas as gpd
 import requests
-import tempfile
+import hashlib
 import os
-from difflib import get_close_matches
-
-# This set is used to filter and standardize country names from the map data.
-VALID_COUNTRIES = {
-    'afghanistan', 'albania', 'algeria', 'andorra', 'angola', 'antigua and barbuda', 'argentina', 
-    'armenia', 'australia', 'austria', 'azerbaijan', 'bahamas', 'bahrain', 'bangladesh', 
-    'barbados', 'belarus', 'belgium', 'belize', 'benin', 'bhutan', 'bolivia', 
-    'bosnia and herzegovina', 'botswana', 'brazil', 'brunei', 'bulgaria', 'burkina faso', 
-    'burundi', 'cambodia', 'cameroon', 'canada', 'cape verde', 'central african republic', 
-    'chad', 'chile', 'china', 'colombia', 'comoros', 'congo', 'costa rica', 'croatia', 
-    'cuba', 'cyprus', 'czech republic', 'democratic republic of the congo', 'denmark', 
-    'djibouti', 'dominica', 'dominican republic', 'ecuador', 'egypt', 'el salvador', 
-    'equatorial guinea', 'eritrea', 'estonia', 'eswatini', 'ethiopia', 'fiji', 'finland', 
-    'france', 'gabon', 'gambia', 'georgia', 'germany', 'ghana', 'greece', 'grenada', 
-    'guatemala', 'guinea', 'guinea-bissau', 'guyana', 'haiti', 'honduras', 'hungary', 
-    'iceland', 'india', 'indonesia', 'iran', 'iraq', 'ireland', 'israel', 'italy', 
-    'ivory coast', 'jamaica', 'japan', 'jordan', 'kazakhstan', 'kenya', 'kiribati', 
-    'kuwait', 'kyrgyzstan', 'laos', 'latvia', 'lebanon', 'lesotho', 'liberia', 'libya', 
-    'liechtenstein', 'lithuania', 'luxembourg', 'madagascar', 'malawi', 'malaysia', 
-    'maldives', 'mali', 'malta', 'marshall islands', 'mauritania', 'mauritius', 'mexico', 
-    'micronesia', 'moldova', 'monaco', 'mongolia', 'montenegro', 'morocco', 'mozambique', 
-    'myanmar', 'namibia', 'nauru', 'nepal', 'netherlands', 'new zealand', 'nicaragua', 
-    'niger', 'nigeria', 'north korea', 'north macedonia', 'norway', 'oman', 'pakistan', 
-    'palau', 'palestine', 'panama', 'papua new guinea', 'paraguay', 'peru', 'philippines', 
-    'poland', 'portugal', 'qatar', 'romania', 'russia', 'rwanda', 'saint kitts and nevis', 
-    'saint lucia', 'saint vincent and the grenadines', 'samoa', 'san marino', 
-    'sao tome and principe', 'saudi arabia', 'senegal', 'serbia', 'seychelles', 
-    'sierra leone', 'singapore', 'slovakia', 'slovenia', 'solomon islands', 'somalia', 
-    'south africa', 'south korea', 'south sudan', 'spain', 'sri lanka', 'sudan', 'suriname', 
-    'sweden', 'switzerland', 'syria', 'taiwan', 'tajikistan', 'tanzania', 'thailand', 
-    'timor-leste', 'togo', 'tonga', 'trinidad and tobago', 'tunisia', 'turkey', 
-    'turkmenistan', 'tuvalu', 'uganda', 'ukraine', 'united arab emirates', 
-    'united kingdom', 'united states', 'uruguay', 'uzbekistan', 'vanuatu', 
-    'vatican city', 'venezuela', 'vietnam', 'yemen', 'zambia', 'zimbabwe'
+import shutil
+import sys
+
+# The pair-table builder lives next to the server code in the repository root
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(DATA_DIR)
+sys.path.insert(0, REPO_DIR)
+import compact_geometry
+import country_names
+import geodesic
+import geometry
+import lookahead
+import pair_tables
+import site_bundle
+import solver
+from artifacts import BUILD_MANIFEST_FILENAME, StageCache, file_sha256, write_manifest
+from compact_geometry import SHAPES_FILENAME, CompactGeometry
+from country_names import VALID_COUNTRIES, unify_country_name
+from pair_tables import PAIR_TABLES_FILENAME, PairTables, build_pair_tables
+from lookahead import OPENING_BOOK_FILENAME, build_opening_book, save_opening_book
+from site_bundle import SITE_BUNDLE_FILENAME, write_site_bundle
+
+NATURAL_EARTH_URL = "https://naciscdn.org/naturalearth/110m/cultural/ne_110m_admin_0_countries.zip"
+GEOJSON_FILENAME = 'countries.geojson'
+CACHE_DIR = os.path.join(DATA_DIR, '.build_cache')
+# The static site in docs/ loads its own compact bundle instead of the GeoJSON
+DOCS_DIR = os.path.join(REPO_DIR, 'docs')
+
+# Bump a stage's version when its code below changes; edits to the modules
+# it uses are picked up from their content hash automatically.
+STAGE_VERSIONS = {
+    'normalize': 2,
+    'shapes': 1,
+    'pair_tables': 1,
+    'opening_book': 2,
+    'site_bundle': 1,
 }
 
-def unify_country_name(raw_name):
-    """Finds the closest match for a country name from the valid list."""
-    raw_lower = raw_name.lower()
-    matches = get_close_matches(raw_lower, VALID_COUNTRIES, n=1, cutoff=0.75)
-    return matches[0] if matches else ''
+def fetch(source, offline=False, expected_sha256=None):
+    """
+    Local path of the source data and its sha256. URLs are downloaded once
+    into the cache and reused; a local file (e.g. a vendored GeoJSON) is used
+    in place, so the whole build can run offline.
+    """
+    if '://' not in source:
+        path = os.path.abspath(source)
+        print(f"fetch: using local file '{path}'")
+    else:
+        fetch_dir = os.path.join(CACHE_DIR, 'fetch', hashlib.sha256(source.encode()).hexdigest()[:20])
+        path = os.path.join(fetch_dir, os.path.basename(source))
+        checksum_path = path + '.sha256'
+        if os.path.exists(path) and os.path.exists(checksum_path):
+            with open(checksum_path) as f:
+                recorded = f.read().strip()
+            if file_sha256(path) != recorded:
+                raise ValueError(f"Cached download '{path}' does not match its recorded checksum; delete it and retry.")
+            print(f"fetch: using cached download '{path}'")
+        elif offline:
+            raise RuntimeError(f"No cached copy of {source} and --offline was given. Use --source with a local file.")
+        else:
+            print("Downloading world map data...")
+            response = requests.get(source, timeout=30)
+            response.raise_for_status()
+            os.makedirs(fetch_dir, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(response.content)
+            with open(checksum_path, 'w') as f:
+                f.write(file_sha256(path))
+
+    sha256 = file_sha256(path)
+    if expected_sha256 and sha256 != expected_sha256.lower():
+        raise ValueError(f"'{path}' has sha256 {sha256}, expected {expected_sha256}.")
+    return path, sha256
+
+def build_normalized(source_path):
+    """Standardized names and non-empty geometries, in the source's row order."""
+    def build(out_dir, stamp):
+        world = gpd.read_file(f"zip://{source_path}" if source_path.endswith('.zip') else source_path)
+        # Natural Earth has 'NAME'; a vendored countries.geojson is already normalized
+        world['name'] = world['NAME' if 'NAME' in world.columns else 'name'].apply(unify_country_name)
+        world = world[world['name'].isin(VALID_COUNTRIES)][['name', 'geometry']]
+        world = world[~world.geometry.is_empty].reset_index(drop=True)
+        # Every later stage and the name index assume one row per country
+        duplicates = sorted(world['name'][world['name'].duplicated()].unique())
+        if duplicates:
+            raise ValueError(f"Several source rows map to {', '.join(duplicates)}; fix the names in country_names.py.")
+        world.to_file(os.path.join(out_dir, GEOJSON_FILENAME), driver='GeoJSON')
+        return [GEOJSON_FILENAME]
+    return build
+
+def read_normalized(outputs):
+    world = gpd.read_file(outputs[GEOJSON_FILENAME])
+    return world['name'].str.lower(), world.geometry
+
+def build_shapes(normalized):
+    """Array-backed shapes, full resolution and simplified."""
+    def build(out_dir, stamp):
+        names, geometries = read_normalized(normalized)
+        compact = CompactGeometry.from_geometries(geometries)
+        compact.save(os.path.join(out_dir, SHAPES_FILENAME), names, compact.simplified(), stamp=stamp)
+        return [SHAPES_FILENAME]
+    return build
+
+def build_tables(normalized, shapes):
+    """Centroids, adjacency and every (guess, target) distance and direction."""
+    def build(out_dir, stamp):
+        names, geometries = read_normalized(normalized)
+        compact, _ = CompactGeometry.load(shapes[SHAPES_FILENAME])
+        tables = build_pair_tables(names, geometries, compact)
+        tables.save(os.path.join(out_dir, PAIR_TABLES_FILENAME), stamp=stamp)
+        return [PAIR_TABLES_FILENAME]
+    return build
 
-def create_geojson():
+def build_book(tables_outputs):
+    """Expert-mode opening book for the first two moves."""
+    def build(out_dir, stamp):
+        tables = PairTables.load(tables_outputs[PAIR_TABLES_FILENAME])
+        save_opening_book(os.path.join(out_dir, OPENING_BOOK_FILENAME), tables, build_opening_book(tables), stamp=stamp)
+        return [OPENING_BOOK_FILENAME]
+    return build
+
+def build_bundle(tables_outputs, shapes):
+    """Compact data bundle for the static site."""
+    def build(out_dir, stamp):
+        tables = PairTables.load(tables_outputs[PAIR_TABLES_FILENAME])
+        compact, _ = CompactGeometry.load(shapes[SHAPES_FILENAME])
+        write_site_bundle(os.path.join(out_dir, SITE_BUNDLE_FILENAME), tables, compact, stamp=stamp)
+        return [SITE_BUNDLE_FILENAME]
+    return build
+
+def hashes(outputs):
+    return {name: file_sha256(path) for name, path in outputs.items()}
+
+def emit(path, built):
+    """Copy a built artifact into place, leaving the file untouched if it is already identical."""
+    if os.path.exists(path) and file_sha256(path) == file_sha256(built):
+        return False
+    temp_path = path + '.tmp'
+    shutil.copyfile(built, temp_path)
+    os.replace(temp_path, path)
+    return True
+
+def create_geojson(source=NATURAL_EARTH_URL, offline=False, expected_sha256=None, force=False):
     """
-    Downloads world map data, processes it, and saves it as a GeoJSON file.
-    This file will contain only the necessary data for the web app.
+    Builds every data artifact in stages:
+
+        fetch -> normalize -> shapes -> pair_tables -> opening_book
+                                                    -> site_bundle
+
+    Each stage is cached under Distance/.build_cache by the hash of its
+    inputs and code, and skipped when nothing changed. The results are then
+    copied next to this script (docs/ for the site bundle) and recorded in
+    build_manifest.json with their build stamps.
     """
-    url = "https://naciscdn.org/naturalearth/110m/cultural/ne_110m_admin_0_countries.zip"
-    temp_dir = tempfile.mkdtemp()
-    temp_file = os.path.join(temp_dir, "world.zip")
-    
-    print("Downloading world map data...")
+    cache = StageCache(CACHE_DIR, force=force)
+    code = lambda *modules: [module.__file__ for module in modules]
+
+    source_path, source_sha256 = fetch(source, offline, expected_sha256)
+    normalize_stamp, normalized = cache.run(
+        'normalize', STAGE_VERSIONS['normalize'], {'source': source_sha256},
+        code(country_names), build_normalized(source_path))
+    shapes_stamp, shapes = cache.run(
+        'shapes', STAGE_VERSIONS['shapes'], hashes(normalized),
+        code(compact_geometry), build_shapes(normalized))
+    tables_stamp, tables = cache.run(
+        'pair_tables', STAGE_VERSIONS['pair_tables'], {**hashes(normalized), **hashes(shapes)},
+        code(pair_tables, geodesic, geometry, compact_geometry), build_tables(normalized, shapes))
+    book_stamp, book = cache.run(
+        'opening_book', STAGE_VERSIONS['opening_book'], hashes(tables),
+        code(lookahead, solver), build_book(tables))
+    bundle_stamp, bundle = cache.run(
+        'site_bundle', STAGE_VERSIONS['site_bundle'], {**hashes(tables), **hashes(shapes)},
+        code(site_bundle, compact_geometry), build_bundle(tables, shapes))
+
+    targets = [
+        (GEOJSON_FILENAME, 'normalize', normalize_stamp, normalized[GEOJSON_FILENAME]),
+        (SHAPES_FILENAME, 'shapes', shapes_stamp, shapes[SHAPES_FILENAME]),
+        (PAIR_TABLES_FILENAME, 'pair_tables', tables_stamp, tables[PAIR_TABLES_FILENAME]),
+        (OPENING_BOOK_FILENAME, 'opening_book', book_stamp, book[OPENING_BOOK_FILENAME]),
+        (os.path.relpath(os.path.join(DOCS_DIR, SITE_BUNDLE_FILENAME), DATA_DIR), 'site_bundle', bundle_stamp,
+         bundle[SITE_BUNDLE_FILENAME]),
+    ]
+    artifacts = {}
+    for name, stage, stamp, built in targets:
+        path = os.path.normpath(os.path.join(DATA_DIR, name))
+        print(f"{'Wrote' if emit(path, built) else 'Unchanged'} '{path}'")
+        artifacts[name.replace(os.sep, '/')] = {'stage': stage, 'stamp': stamp, 'sha256': file_sha256(path)}
+    write_manifest(DATA_DIR, {'location': source if '://' in source else os.path.basename(source),
+                              'sha256': source_sha256}, artifacts)
+
+    print(f"\nSuccess! Artifacts and '{BUILD_MANIFEST_FILENAME}' are up to date in '{DATA_DIR}'.")
+    print(f"You can now upload 'index.html' and '{SITE_BUNDLE_FILENAME}' from docs/ to GitHub Pages.")
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the country data artifacts for the server and the static site.')
+    parser.add_argument('--source', default=NATURAL_EARTH_URL,
+                        help='Natural Earth URL, or a local zip/GeoJSON such as countries.geojson to build offline')
+    parser.add_argument('--sha256', help='expected checksum of the source data')
+    parser.add_argument('--offline', action='store_true', help='never download; use the cache or --source')
+    parser.add_argument('--force', action='store_true', help='rebuild every stage even if it is cached')
+    args = parser.parse_args()
     try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        with open(temp_file, 'wb') as f:
-            f.write(response.content)
-        
-        print("Processing data...")
-        # Read the shapefile
-        world = gpd.read_file(f"zip://{temp_file}")
-        
-        # Standardize country names
-        world['name'] = world['NAME'].apply(unify_country_name)
-        
-        # Filter out countries not in our valid list and keep only essential columns
-        world = world[world['name'].isin(VALID_COUNTRIES)][['name', 'geometry']]
-        
-        # Ensure there are no rows with empty geometries
-        world = world[~world.geometry.is_empty]
-        
-        # Save to GeoJSON
-        output_filename = 'countries.geojson'
-        world.to_file(output_filename, driver='GeoJSON')
-        
-        print(f"\nSuccess! Data saved to '{output_filename}'.")
-        print("You can now upload 'index.html' and 'countries.geojson' to GitHub Pages.")
-        
+        create_geojson(args.source, args.offline, args.sha256, args.force)
     except requests.exceptions.RequestException as e:
         print(f"Error downloading data: {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"An error occurred during processing: {e}")
-    finally:
-        # Clean up temporary files
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-        if os.path.exists(temp_dir):
-            os.rmdir(temp_dir)
+        sys.exit(1)
 
 if __name__ == '__main__':
-    create_geojson()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -1,219 +1,72 @@
 # app.py
-from flask import Flask, render_template, request, jsonify, session
-import geopandas as gpd
-import numpy as np
-from shapely.ops import nearest_points
-from math import degrees, atan2
-import warnings
-import requests
-import tempfile
+from flask import Flask, Response, g, render_template, request, jsonify, session
+import cProfile
+import io
+import json
 import os
-import math
-import sys
-from difflib import get_close_matches
+import pstats
+import threading
+import time
+from functools import partial
+from solver import (
+    parse_distance, find_best_guess, neighbors_in_direction, constrained_guess,
+    initial_candidates, encode_candidates, decode_candidates, SOLVER_MODES,
+)
+from lookahead import best_guess, best_guess_cache_info
+from batch import get_batch_solver
+from world_store import get_world, world_store
+from game_state import GameState, create_game_store
+from response_cache import guess_cache
+from solver_pool import PoolBusy, SolverTimeout, solver_pool
+import metrics
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here')  # Use environment variable for secret key
 
-VALID_COUNTRIES = {
-    'afghanistan', 'albania', 'algeria', 'andorra', 'angola', 'antigua and barbuda', 'argentina', 
-    'armenia', 'australia', 'austria', 'azerbaijan', 'bahamas', 'bahrain', 'bangladesh', 
-    'barbados', 'belarus', 'belgium', 'belize', 'benin', 'bhutan', 'bolivia', 
-    'bosnia and herzegovina', 'botswana', 'brazil', 'brunei', 'bulgaria', 'burkina faso', 
-    'burundi', 'cambodia', 'cameroon', 'canada', 'cape verde', 'central african republic', 
-    'chad', 'chile', 'china', 'colombia', 'comoros', 'congo', 'costa rica', 'croatia', 
-    'cuba', 'cyprus', 'czech republic', 'democratic republic of the congo', 'denmark', 
-    'djibouti', 'dominica', 'dominican republic', 'ecuador', 'egypt', 'el salvador', 
-    'equatorial guinea', 'eritrea', 'estonia', 'eswatini', 'ethiopia', 'fiji', 'finland', 
-    'france', 'gabon', 'gambia', 'georgia', 'germany', 'ghana', 'greece', 'grenada', 
-    'guatemala', 'guinea', 'guinea-bissau', 'guyana', 'haiti', 'honduras', 'hungary', 
-    'iceland', 'india', 'indonesia', 'iran', 'iraq', 'ireland', 'israel', 'italy', 
-    'ivory coast', 'jamaica', 'japan', 'jordan', 'kazakhstan', 'kenya', 'kiribati', 
-    'kuwait', 'kyrgyzstan', 'laos', 'latvia', 'lebanon', 'lesotho', 'liberia', 'libya', 
-    'liechtenstein', 'lithuania', 'luxembourg', 'madagascar', 'malawi', 'malaysia', 
-    'maldives', 'mali', 'malta', 'marshall islands', 'mauritania', 'mauritius', 'mexico', 
-    'micronesia', 'moldova', 'monaco', 'mongolia', 'montenegro', 'morocco', 'mozambique', 
-    'myanmar', 'namibia', 'nauru', 'nepal', 'netherlands', 'new zealand', 'nicaragua', 
-    'niger', 'nigeria', 'north korea', 'north macedonia', 'norway', 'oman', 'pakistan', 
-    'palau', 'palestine', 'panama', 'papua new guinea', 'paraguay', 'peru', 'philippines', 
-    'poland', 'portugal', 'qatar', 'romania', 'russia', 'rwanda', 'saint kitts and nevis', 
-    'saint lucia', 'saint vincent and the grenadines', 'samoa', 'san marino', 
-    'sao tome and principe', 'saudi arabia', 'senegal', 'serbia', 'seychelles', 
-    'sierra leone', 'singapore', 'slovakia', 'slovenia', 'solomon islands', 'somalia', 
-    'south africa', 'south korea', 'south sudan', 'spain', 'sri lanka', 'sudan', 'suriname', 
-    'sweden', 'switzerland', 'syria', 'taiwan', 'tajikistan', 'tanzania', 'thailand', 
-    'timor-leste', 'togo', 'tonga', 'trinidad and tobago', 'tunisia', 'turkey', 
-    'turkmenistan', 'tuvalu', 'uganda', 'ukraine', 'united arab emirates', 
-    'united kingdom', 'united states', 'uruguay', 'uzbekistan', 'vanuatu', 
-    'vatican city', 'venezuela', 'vietnam', 'yemen', 'zambia', 'zimbabwe'
-}
+# Games live server-side; the session only holds the game id (see game_state.py)
+game_store = create_game_store()
 
-# Original helper functions remain unchanged
-def unify_country_name(raw_name):
-    raw_lower = raw_name.lower()
-    matches = get_close_matches(raw_lower, VALID_COUNTRIES, n=1, cutoff=0.75)
-    return matches[0] if matches else ''
+def current_game(data):
+    """The game named by the request body's game_id, or by the session"""
+    game_id = data.get('game_id') or session.get('game_id')
+    return game_store.get(game_id) if game_id else None
 
-def download_world_data():
-    url = "https://naciscdn.org/naturalearth/110m/cultural/ne_110m_admin_0_countries.zip"
-    temp_dir = tempfile.mkdtemp()
-    temp_file = os.path.join(temp_dir, "world.zip")
-    
-    print("Downloading world map data...")
-    response = requests.get(url)
-    with open(temp_file, 'wb') as f:
-        f.write(response.content)
-    
-    world = gpd.read_file(f"zip://{temp_file}")
-    os.remove(temp_file)
-    os.rmdir(temp_dir)
-    
-    world['name_lower'] = world['NAME'].apply(unify_country_name)
-    world = world[world.name_lower.isin(VALID_COUNTRIES)]
-    return world
-
-def calculate_direction(from_geom, to_geom):
-    """Calculate direction between two country geometries using closest points"""
-    p1, p2 = nearest_points(from_geom, to_geom)
-    dx = p2.x - p1.x
-    dy = p2.y - p1.y
-    bearing = degrees(atan2(dx, dy))
-    bearing = (bearing + 360) % 360
-    
-    directions = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
-    index = round(bearing / 45) % 8
-    return directions[index]
-
-def calculate_border_distance(country1_geom, country2_geom):
-    """Calculate shortest distance between country borders in km"""
-    distance = country1_geom.distance(country2_geom)
-    return round(distance * 100 / 10) * 10
+def run_solver(fn, *args, **kwargs):
+    """Solver work goes to the bounded pool, except in profiled requests where it must run on this thread"""
+    if g.get('profiler') is not None:
+        return fn(*args, **kwargs)
+    return solver_pool.run(fn, *args, **kwargs)
 
-# Functions for centroid-based calculations
-def get_centroid_coords(geometry):
-    """Calculate the centroid coordinates of a geometry. Returns (lat, lon)."""
-    centroid = geometry.centroid
-    return (centroid.y, centroid.x)
+def solver_unavailable(e):
+    """503 when the solver pool is full, 504 when the solver call timed out"""
+    response = jsonify({
+        'success': False,
+        'message': str(e)
+    })
+    if isinstance(e, PoolBusy):
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    return response, 504
 
-def calculate_bearing(pointA, pointB):
-    """Calculate the bearing from pointA to pointB."""
-    lat1 = math.radians(pointA[0])
-    lat2 = math.radians(pointB[0])
-    diffLong = math.radians(pointB[1] - pointA[1])
-
-    x = math.sin(diffLong) * math.cos(lat2)
-    y = math.cos(lat1) * math.sin(lat2) - (
-        math.sin(lat1) * math.cos(lat2) * math.cos(diffLong)
-    )
-
-    initial_bearing = math.atan2(x, y)
-    initial_bearing = math.degrees(initial_bearing)
-    compass_bearing = (initial_bearing + 360) % 360
-    return compass_bearing
-
-def bearing_to_direction(bearing):
-    """Convert bearing to cardinal direction."""
-    directions = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
-    idx = int((bearing + 22.5) % 360 / 45)
-    return directions[idx]
-
-def get_neighbors(world_data, country_geometry):
-    """Find neighboring countries by checking for shared borders."""
-    neighbors = world_data[world_data.touches(country_geometry)]
-    return neighbors
-
-# Updated find_best_guess function with centroid fallback
-def find_best_guess(world_data, current_country, target_distance, target_direction):
-    """
-    Find the best next guess based on distance and direction.
-    Now includes fallback to centroid-based direction when no matches found with border-based approach.
-    """
-    current_geom = world_data[world_data.name_lower == current_country.lower()].geometry.iloc[0]
-    
-    # Handle neighboring countries case (<10km)
-    if target_distance == 0:
-        neighbors = get_neighbors(world_data, current_geom)
-        if neighbors.empty:
-            print(f"No neighboring countries found for '{current_country}'.")
-            sys.exit(0)
-        
-        matching_neighbors = []
-        country_centroid = get_centroid_coords(current_geom)
-        
-        for idx, neighbor in neighbors.iterrows():
-            neighbor_centroid = get_centroid_coords(neighbor.geometry)
-            bearing = calculate_bearing(country_centroid, neighbor_centroid)
-            direction = bearing_to_direction(bearing)
-            if direction == target_direction:
-                matching_neighbors.append(neighbor['name_lower'].title())
-        
-        if matching_neighbors:
-            print(f"\nSince the distance is <10km, country could be one of these:")
-            for name in matching_neighbors:
-                print(f"- {name}")
-        else:
-            print(f"\nNo bordering countries found to the {target_direction} of '{current_country}' within <10km.")
-        sys.exit(0)
-    
-    # First attempt: Use border-based direction calculation
-    best_country = None
-    min_distance_diff = float('inf')
-    
-    for idx, row in world_data.iterrows():
-        if row.name_lower == current_country.lower():
-            continue
-            
-        direction = calculate_direction(current_geom, row.geometry)
-        
-        if direction == target_direction:
-            distance = calculate_border_distance(current_geom, row.geometry)
-            distance_diff = abs(distance - target_distance)
-            if distance_diff < min_distance_diff:
-                min_distance_diff = distance_diff
-                best_country = row.name_lower
-    
-    # If no country found, fallback to centroid-based direction
-    if best_country is None:
-        current_centroid = get_centroid_coords(current_geom)
-        
-        for idx, row in world_data.iterrows():
-            if row.name_lower == current_country.lower():
-                continue
-            
-            target_centroid = get_centroid_coords(row.geometry)
-            bearing = calculate_bearing(current_centroid, target_centroid)
-            direction = bearing_to_direction(bearing)
-            
-            if direction == target_direction:
-                distance = calculate_border_distance(current_geom, row.geometry)
-                distance_diff = abs(distance - target_distance)
-                if distance_diff < min_distance_diff:
-                    min_distance_diff = distance_diff
-                    best_country = row.name_lower
-
-    return best_country.title() if best_country else None
-
-def parse_distance(distance_str):
-    """Parse distance input, handling '<10km' case"""
-    if distance_str.strip().lower() == '<10km' or distance_str.strip().lower() == '<10':
-        return 0
-    try:
-        return float(distance_str)
-    except ValueError:
-        raise ValueError("Invalid distance format. Please use a number or '<10km'")
+def game_conflict():
+    """409 when another request changed the game while this one was being answered"""
+    return jsonify({
+        'success': False,
+        'message': 'This game was changed by another request. Please try again.'
+    }), 409
 
 def play_globle():
     try:
-        world_data = download_world_data()
+        world = get_world()
     except Exception as e:
-        print(f"Error downloading world data: {e}")
+        print(f"Error loading world data: {e}")
         return
     
     # Get first guess without showing "Try this country"
     while True:
-        current_guess = input("\nEnter your first guess country: ").lower()
-        if current_guess in world_data.name_lower.tolist():
-            current_guess = world_data.loc[world_data.name_lower == current_guess, 'name_lower'].iloc[0].title()
+        current_guess = world.resolve(input("\nEnter your first guess country: "))
+        if current_guess:
+            current_guess = current_guess.title()
             break
         print("Country not found. Please check the spelling and try again.")
     
@@ -243,7 +96,18 @@ def play_globle():
                 print("Invalid direction. Use N, NE, E, SE, S, SW, W, or NW")
                 continue
             
-            next_guess = find_best_guess(world_data, current_guess, distance, direction)
+            # Handle neighboring countries case (<10km): list the candidates and end the game
+            if distance == 0:
+                result = neighbors_in_direction(world, current_guess, direction)
+                if result['success']:
+                    print(f"\nSince the distance is <10km, country could be one of these:")
+                    for name in result['neighboring_countries']:
+                        print(f"- {name}")
+                else:
+                    print(f"\n{result['message']}")
+                return
+            
+            next_guess = find_best_guess(world, current_guess, distance, direction)
             
             if next_guess is None:
                 print("Couldn't find a suitable next guess. Please check the inputs.")
@@ -259,8 +123,9 @@ def play_globle():
 def index():
     """Route for the main game page"""
     # Initialize or reset game state
-    session['current_guess'] = None
-    session['is_first_iteration'] = True
+    game_id = session.pop('game_id', None)
+    if game_id:
+        game_store.delete(game_id)
     return render_template('index.html')
 
 @app.route('/initialize-game', methods=['POST'])
@@ -269,23 +134,39 @@ def initialize_game():
     try:
         data = request.get_json()
         current_guess = data.get('guess', '').lower()
+        mode = data.get('mode', 'latest')
+        if mode not in SOLVER_MODES:
+            return jsonify({
+                'success': False,
+                'message': f"Invalid mode. Use one of: {', '.join(SOLVER_MODES)}"
+            })
+        
+        world = get_world()
         
-        # Download world data (you might want to cache this)
-        world_data = download_world_data()
+        # In expert mode an empty first guess means "start from the opening book"
+        if mode == 'expert' and not current_guess:
+            candidates = initial_candidates(world.tables)
+            current_guess = world.tables.names[run_solver(best_guess, world.tables, candidates, world.opening_book)]
         
-        if current_guess in world_data.name_lower.tolist():
-            current_guess = world_data.loc[world_data.name_lower == current_guess, 'name_lower'].iloc[0].title()
-            session['current_guess'] = current_guess
-            session['is_first_iteration'] = True
+        current_guess = world.resolve(current_guess)
+        if current_guess:
+            current_guess = current_guess.title()
+            candidates = encode_candidates(initial_candidates(world.tables)) if mode != 'latest' else None
+            game = GameState.new(mode, current_guess, candidates)
+            game_store.save(game)
+            session['game_id'] = game.game_id
             return jsonify({
                 'success': True,
-                'message': f'Starting game with {current_guess}'
+                'message': f'Starting game with {current_guess}',
+                'game_id': game.game_id
             })
         else:
             return jsonify({
                 'success': False,
                 'message': 'Country not found. Please check the spelling and try again.'
             })
+    except (PoolBusy, SolverTimeout) as e:
+        return solver_unavailable(e)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -308,65 +189,91 @@ def make_guess():
                 'message': 'Invalid direction. Use N, NE, E, SE, S, SW, W, or NW'
             })
         
-        current_guess = session.get('current_guess')
-        if not current_guess:
+        game = current_game(data)
+        if game is None:
             return jsonify({
                 'success': False,
                 'message': 'No current guess found. Please start a new game.'
             })
+        current_guess = game.current_guess
+        # Saved back only if no other request changed the game in the meantime
+        expected_updated = game.updated
             
         distance = parse_distance(distance_str)
-        world_data = download_world_data()
         
-        # Special handling for <10km case
-        if distance == 0:
-            current_geom = world_data[world_data.name_lower == current_guess.lower()].geometry.iloc[0]
-            neighbors = get_neighbors(world_data, current_geom)
-            
-            if neighbors.empty:
+        world = get_world()
+        
+        # A client that names the country its clue is about can safely retry: a resubmitted last
+        # clue gets the answer it already produced, and a clue about an older guess is rejected
+        guess = data.get('guess')
+        if guess is not None and not isinstance(guess, str):
+            return jsonify({
+                'success': False,
+                'message': 'Invalid guess. Use the name of the country the clue is about.'
+            })
+        if guess:
+            resolved = world.resolve(guess)
+            if not resolved:
                 return jsonify({
                     'success': False,
-                    'message': f"No neighboring countries found for '{current_guess}'."
+                    'message': 'Country not found. Please check the spelling and try again.'
                 })
-            
-            matching_neighbors = []
-            country_centroid = get_centroid_coords(current_geom)
-            
-            for idx, neighbor in neighbors.iterrows():
-                neighbor_centroid = get_centroid_coords(neighbor.geometry)
-                bearing = calculate_bearing(country_centroid, neighbor_centroid)
-                direction_calc = bearing_to_direction(bearing)
-                if direction_calc == direction:
-                    matching_neighbors.append(neighbor['name_lower'].title())
-            
-            if matching_neighbors:
+            repeated = game.repeated_result(resolved, distance, direction)
+            if repeated is not None:
+                return jsonify(repeated)
+            if resolved != current_guess.lower():
                 return jsonify({
-                    'success': True,
-                    'neighboring_countries': matching_neighbors
+                    'success': False,
+                    'message': f'This clue is about {resolved.title()}, but the current guess is {current_guess}.'
                 })
+        
+        
+        # Constrained and expert modes treat every clue, including <10km, as a filter on the candidates
+        mode = game.mode
+        if mode != 'latest':
+            candidates = decode_candidates(game.candidates, len(world.tables))
+            if mode == 'expert':
+                next_guess, candidates = run_solver(constrained_guess, world, candidates, current_guess, distance,
+                                                         direction, choose=partial(best_guess, opening_book=world.opening_book))
             else:
+                next_guess, candidates = run_solver(constrained_guess, world, candidates, current_guess, distance,
+                                                         direction)
+            
+            if next_guess is None:
                 return jsonify({
                     'success': False,
-                    'message': f"No bordering countries found to the {direction} of '{current_guess}' within <10km."
+                    'message': 'Could not find a suitable next guess. Please check the inputs.'
                 })
+            
+            result = {
+                'success': True,
+                'next_guess': next_guess,
+                'remaining_candidates': int(candidates.sum())
+            }
+            game.add_clue(distance, direction, result)
+            game.current_guess = next_guess
+            game.candidates = encode_candidates(candidates)
+            if not game_store.save(game, expected_updated):
+                return game_conflict()
+            
+            return jsonify(result)
         
-        # Normal case (>10km)
-        next_guess = find_best_guess(world_data, current_guess, distance, direction)
+        # Latest mode only depends on this clue, so the answer can come from the shared cache.
+        # <10km lists the neighbours and keeps the current guess.
+        result = run_solver(guess_cache.answer, world, current_guess, distance, direction)
+        if distance != 0 and not result['success']:
+            return jsonify(result)
         
-        if next_guess is None:
-            return jsonify({
-                'success': False,
-                'message': 'Could not find a suitable next guess. Please check the inputs.'
-            })
-            
-        session['current_guess'] = next_guess
-        session['is_first_iteration'] = False
+        game.add_clue(distance, direction, result)
+        if distance != 0:
+            game.current_guess = result['next_guess']
+        if not game_store.save(game, expected_updated):
+            return game_conflict()
         
-        return jsonify({
-            'success': True,
-            'next_guess': next_guess
-        })
+        return jsonify(result)
         
+    except (PoolBusy, SolverTimeout) as e:
+        return solver_unavailable(e)
     except ValueError as e:
         return jsonify({
             'success': False,
@@ -378,8 +285,161 @@ def make_guess():
             'message': f'Unexpected error: {str(e)}'
         })
 
+# Latest-mode answers only change when the world data is reloaded
+BEST_GUESS_MAX_AGE = int(os.environ.get('BEST_GUESS_MAX_AGE', 3600))
+
+@app.route('/best-guess')
+def best_guess_lookup():
+    """Stateless latest-mode answer: /best-guess?country=France&distance=1200&direction=E"""
+    try:
+        direction = request.args.get('direction', '').upper()
+        if direction not in ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid direction. Use N, NE, E, SE, S, SW, W, or NW'
+            }), 400
+        distance = parse_distance(request.args.get('distance', '').lower().replace('km', ''))
+        world = get_world()
+        country = world.resolve(request.args.get('country', ''))
+        if not country:
+            return jsonify({
+                'success': False,
+                'message': 'Country not found. Please check the spelling and try again.'
+            }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }), 400
+    
+    try:
+        response = jsonify(run_solver(guess_cache.answer, world, country, distance, direction))
+    except (PoolBusy, SolverTimeout) as e:
+        return solver_unavailable(e)
+    response.cache_control.public = True
+    response.cache_control.max_age = BEST_GUESS_MAX_AGE
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.after_request
+def no_store_posts(response):
+    """Game moves change server-side state; never let a cache replay them"""
+    if request.method == 'POST':
+        response.headers.setdefault('Cache-Control', 'no-store')
+    return response
+
+# Send 'X-Profile: 1' to run one request under cProfile; only honoured when PROFILE_REQUESTS is set.
+# The top functions are printed, and the raw stats saved to PROFILE_DIR if given.
+# Only one request is profiled at a time (Python 3.12+ refuses a second active profiler);
+# a profile request arriving meanwhile runs unprofiled and gets 'X-Profile: busy'.
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+PROFILE_TOP = 25
+profile_lock = threading.Lock()
+
+@app.before_request
+def start_request_timing():
+    g.started = time.perf_counter()
+    if PROFILE_REQUESTS and request.headers.get('X-Profile') == '1':
+        if not profile_lock.acquire(blocking=False):
+            g.profile_busy = True
+            return
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def record_request_timing(response):
+    profiler = g.get('profiler')
+    if profiler is not None:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        print(f"Profile of {request.method} {request.path}:\n{out.getvalue()}")
+        if PROFILE_DIR:
+            path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{request.path.strip('/').replace('/', '_') or 'index'}.prof")
+            profiler.dump_stats(path)
+            response.headers['X-Profile-Path'] = path
+    elif g.get('profile_busy'):
+        response.headers['X-Profile'] = 'busy'
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.http_request_seconds.observe(time.perf_counter() - g.started, route=route, method=request.method,
+                                         status=response.status_code)
+    return response
+
+@app.teardown_request
+def stop_profiling(exc):
+    """Runs even when after_request did not, so the profiler slot is always given back"""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        profile_lock.release()
+
+def cache_metrics():
+    """Cache hit ratios and occupancy, read at scrape time"""
+    lru_caches = [('lookahead', best_guess_cache_info())]
+    if world_store.loaded:
+        lru_caches.append(('country_name_fuzzy', get_world().name_index.cache_info()))
+    samples = [({'cache': 'guess'}, guess_cache.info())]
+    for name, info in lru_caches:
+        samples.append(({'cache': name}, {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}))
+    ratio = []
+    for labels, info in samples:
+        lookups = info['hits'] + info['misses']
+        ratio.append((labels, info['hits'] / lookups if lookups else 0.0))
+    return [
+        ('cache_hits_total', 'counter', 'Cache hits.', [(labels, info['hits']) for labels, info in samples]),
+        ('cache_misses_total', 'counter', 'Cache misses.', [(labels, info['misses']) for labels, info in samples]),
+        ('cache_hit_ratio', 'gauge', 'Hits over lookups since start.', ratio),
+        ('cache_entries', 'gauge', 'Entries currently cached.', [(labels, info['size']) for labels, info in samples]),
+        ('solver_pool_in_flight', 'gauge', 'Solver calls running or queued.', [({}, solver_pool.in_flight)]),
+        ('solver_pool_max_pending', 'gauge', 'Solver calls allowed before answering 503.', [({}, solver_pool.max_pending)]),
+        ('games_stored', 'gauge', 'Games in the game store.', [({}, len(game_store))]),
+    ]
+
+metrics.add_collector(cache_metrics)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of the stage timings, exact geometry counts and cache ratios"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Upper bound on games per /solve-batch request
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 50000))
+
+@app.route('/solve-batch', methods=['POST'])
+def solve_batch():
+    """Solve many clue histories in parallel; results stream back as a JSON array in input order"""
+    data = request.get_json(silent=True)
+    games = data.get('games') if isinstance(data, dict) else None
+    if not isinstance(games, list):
+        return jsonify({
+            'success': False,
+            'message': "Expected a JSON object with a 'games' list."
+        }), 400
+    if len(games) > MAX_BATCH_SIZE:
+        return jsonify({
+            'success': False,
+            'message': f'Too many games in one batch (limit {MAX_BATCH_SIZE}).'
+        }), 400
+    
+    solver = get_batch_solver(get_world())
+    
+    def generate():
+        yield '['
+        for position, result in enumerate(solver.solve(games)):
+            yield (',' if position else '') + json.dumps(result)
+        yield ']'
+    
+    return Response(generate(), mimetype='application/json')
+
 if __name__ == '__main__':
     # Use port and host from environment variables, default to 5000 and '0.0.0.0'
     port = int(os.environ.get('PORT', 5000))
     host = os.environ.get('HOST', '0.0.0.0')
+    # Load the world geometry once before serving the first request
+    world_store.load()
+    print(f"Loaded world data from {world_store.source}")
+    if os.environ.get('GUESS_CACHE_PREWARM', '').lower() in ('1', 'true', 'yes'):
+        info = guess_cache.prewarm(world_store.load())
+        print(f"Prewarmed the guess cache with {info['size']} answers")
     app.run(host=host, port=port)
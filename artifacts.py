@@ -0,0 +1,141 @@
+# artifacts.py
+"""
+Build stamps and the content-hashed stage cache of the data pipeline.
+
+Distance/prepare_data.py builds the data in stages. Each stage's cache key
+is a hash of its inputs' contents, its parameters, its STAGE_VERSION and the
+source files of the code it runs. A stage whose key is already in the cache
+is skipped. The key is also the stamp embedded in every artifact the stage
+writes.
+
+build_manifest.json, next to the artifacts, records each artifact's stamp
+and sha256. At startup the server calls stale_artifacts() and rebuilds in
+memory anything whose stamp or source data does not match the manifest,
+rather than trusting files from different builds.
+"""
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+import numpy as np
+
+BUILD_MANIFEST_FILENAME = 'build_manifest.json'
+# Bump when the manifest or stamp layout changes
+BUILD_FORMAT_VERSION = 1
+# Artifact every other one is derived from
+SOURCE_ARTIFACT = 'countries.geojson'
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_stamp(path):
+    """The build stamp embedded in an artifact, or None for formats without one."""
+    if path.endswith('.npz'):
+        with np.load(path, allow_pickle=False) as data:
+            return str(data['build_stamp']) if 'build_stamp' in data.files else None
+    if path.endswith('.json'):
+        with open(path) as f:
+            return json.load(f).get('build_stamp')
+    if path.endswith('.bin'):
+        with open(path, 'rb') as f:
+            f.seek(4)
+            (header_size,) = struct.unpack('<I', f.read(4))
+            return json.loads(f.read(header_size)).get('build_stamp')
+    return None
+
+class StageCache:
+    """cache_dir/<stage>/<key>/ holds the files one run of a stage produced."""
+
+    def __init__(self, cache_dir, force=False):
+        self.cache_dir = cache_dir
+        self.force = force
+
+    @staticmethod
+    def key(stage, version, inputs, code_files):
+        payload = {
+            'stage': stage,
+            'version': version,
+            'inputs': inputs,
+            'code': {os.path.basename(path): file_sha256(path) for path in code_files},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:20]
+
+    def run(self, stage, version, inputs, code_files, build):
+        """
+        Run build(out_dir, stamp) unless this exact stage already ran. Returns
+        (stamp, {filename: path}); the files' sha256 are the inputs of the
+        stages that use them.
+        """
+        stamp = self.key(stage, version, inputs, code_files)
+        stage_dir = os.path.join(self.cache_dir, stage, stamp)
+        record_path = os.path.join(stage_dir, 'outputs.json')
+        if not self.force and os.path.exists(record_path):
+            with open(record_path) as f:
+                record = json.load(f)
+            outputs = {name: os.path.join(stage_dir, name) for name in record}
+            if all(os.path.exists(path) and file_sha256(path) == record[name] for name, path in outputs.items()):
+                print(f"{stage}: up to date ({stamp})")
+                return stamp, outputs
+
+        print(f"{stage}: building ({stamp})")
+        os.makedirs(os.path.join(self.cache_dir, stage), exist_ok=True)
+        work_dir = tempfile.mkdtemp(dir=os.path.join(self.cache_dir, stage))
+        try:
+            names = build(work_dir, stamp)
+            with open(os.path.join(work_dir, 'outputs.json'), 'w') as f:
+                json.dump({name: file_sha256(os.path.join(work_dir, name)) for name in names}, f, indent=1)
+            shutil.rmtree(stage_dir, ignore_errors=True)
+            os.replace(work_dir, stage_dir)
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+        return stamp, {name: os.path.join(stage_dir, name) for name in names}
+
+def write_manifest(directory, source, artifacts):
+    """artifacts: {path relative to directory: {'stage', 'stamp', 'sha256'}}"""
+    manifest = {'format_version': BUILD_FORMAT_VERSION, 'source': source, 'artifacts': artifacts}
+    with open(os.path.join(directory, BUILD_MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write('\n')
+
+def stale_artifacts(directory, filenames):
+    """
+    Which of filenames (in directory) must not be loaded: built by another
+    manifest format, from other source data, or carrying another stamp than
+    the manifest records. Without a manifest nothing can be checked and
+    nothing is reported stale.
+    """
+    path = os.path.join(directory, BUILD_MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        print(f"No {BUILD_MANIFEST_FILENAME} in '{directory}', skipping artifact validation.")
+        return set()
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != BUILD_FORMAT_VERSION:
+        print(f"'{path}' has format version {manifest.get('format_version')}, expected {BUILD_FORMAT_VERSION}.")
+        return set(filenames)
+
+    artifacts = manifest.get('artifacts', {})
+    source = artifacts.get(SOURCE_ARTIFACT)
+    source_path = os.path.join(directory, SOURCE_ARTIFACT)
+    if source and os.path.exists(source_path) and file_sha256(source_path) != source['sha256']:
+        print(f"'{source_path}' changed since the last build; derived artifacts are stale.")
+        return set(filenames)
+
+    stale = set()
+    for name in filenames:
+        entry = artifacts.get(name)
+        artifact_path = os.path.join(directory, name)
+        if entry is None or not os.path.exists(artifact_path):
+            continue
+        stamp = read_stamp(artifact_path)
+        if stamp != entry['stamp']:
+            print(f"'{artifact_path}' has build stamp {stamp}, the manifest expects {entry['stamp']}.")
+            stale.add(name)
+    return stale
@@ -0,0 +1,184 @@
+# batch.py
+"""
+Parallel batch solving.
+
+A batch is a list of games, each a clue history:
+
+    {"mode": "latest", "clues": [{"guess": "France", "distance": "1000km", "direction": "E"},
+                                 {"distance": "320", "direction": "N"}]}
+
+Every clue after the first may omit "guess", meaning the player tried the
+country the solver suggested. Games are fanned out over a process pool
+whose workers are spawned, not forked, since the pool is started from a
+threaded server. Workers do not receive the GeoDataFrame: the parent writes
+the pair tables once as .npy files and every worker memory-maps them, so the
+pages are shared by the OS instead of pickled per worker. Results come back
+in input order as they complete.
+"""
+import atexit
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from geometry import DIRECTIONS
+from lookahead import OPENING_BOOK_FILENAME, best_guess
+from pair_tables import PairTables
+from solver import (
+    parse_distance, find_best_guess, neighbors_in_direction,
+    constrained_guess, initial_candidates, SOLVER_MODES,
+)
+from world_store import World
+
+DEFAULT_CHUNKSIZE = 8
+
+def solve_game(world, clues, mode='latest'):
+    """
+    Replay one clue history and return the solver's answer to the last clue,
+    in the same shape as the /make-guess response plus the list of
+    suggestions made along the way.
+    """
+    if mode not in SOLVER_MODES:
+        raise ValueError(f"Invalid mode. Use one of: {', '.join(SOLVER_MODES)}")
+    if not isinstance(clues, list) or not clues:
+        raise ValueError('A game needs a non-empty list of clues')
+
+    candidates = initial_candidates(world.tables)
+    choose = partial(best_guess, opening_book=world.opening_book)
+    suggestions = []
+    current_guess = None
+
+    for position, clue in enumerate(clues):
+        if not isinstance(clue, dict):
+            raise ValueError('Each clue must be an object with distance and direction')
+        if clue.get('guess'):
+            canonical = world.resolve(str(clue['guess']))
+            if not canonical:
+                raise ValueError(f"Country not found: '{clue['guess']}'")
+            current_guess = canonical.title()
+        if not current_guess:
+            raise ValueError('The first clue needs the country that was guessed')
+        distance = parse_distance(str(clue.get('distance', '')).lower().replace('km', ''))
+        direction = str(clue.get('direction', '')).upper()
+        if direction not in DIRECTIONS:
+            raise ValueError('Invalid direction. Use N, NE, E, SE, S, SW, W, or NW')
+
+        if mode == 'latest' and distance == 0:
+            # A <10km answer is a list of neighbours rather than one next guess
+            if position != len(clues) - 1:
+                raise ValueError('In latest mode a <10km clue must be the last one')
+            result = neighbors_in_direction(world, current_guess, direction)
+            result['guesses'] = suggestions
+            return result
+
+        if mode == 'latest':
+            next_guess = find_best_guess(world, current_guess, distance, direction)
+        elif mode == 'constrained':
+            next_guess, candidates = constrained_guess(world, candidates, current_guess, distance, direction)
+        else:
+            next_guess, candidates = constrained_guess(world, candidates, current_guess, distance, direction,
+                                                       choose=choose)
+        if next_guess is None:
+            return {'success': False, 'guesses': suggestions,
+                    'message': 'Could not find a suitable next guess. Please check the inputs.'}
+        suggestions.append(next_guess)
+        current_guess = next_guess
+
+    result = {'success': True, 'guesses': suggestions, 'next_guess': current_guess}
+    if mode != 'latest':
+        result['remaining_candidates'] = int(candidates.sum())
+    return result
+
+# Per-worker state, set once by _init_worker
+_worker_world = None
+
+def _init_worker(directory):
+    global _worker_world
+    tables = PairTables.load_arrays(directory)
+    with open(os.path.join(directory, OPENING_BOOK_FILENAME)) as f:
+        opening_book = json.load(f)
+    _worker_world = World(None, tables, directory, opening_book)
+
+def _solve_item(game):
+    try:
+        if not isinstance(game, dict):
+            raise ValueError('Each game must be an object with a list of clues')
+        return solve_game(_worker_world, game.get('clues'), game.get('mode', 'latest'))
+    except ValueError as e:
+        return {'success': False, 'message': f'Error: {str(e)}'}
+
+class BatchSolver:
+    """A process pool whose workers share one memory-mapped copy of the world's pair tables."""
+
+    def __init__(self, world, max_workers=None):
+        self.world = world
+        self.broken = False
+        self._directory = tempfile.mkdtemp(prefix='globle-tables-')
+        world.tables.save_arrays(self._directory)
+        with open(os.path.join(self._directory, OPENING_BOOK_FILENAME), 'w') as f:
+            json.dump(world.opening_book, f)
+        # A forked child could inherit a lock held by another server thread and hang
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self._directory,),
+        )
+
+    def solve(self, games, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        Yield one result per game, in input order. If a worker dies the pool
+        is unusable: it is marked broken and every game still without a
+        result gets an error, so a streamed response stays well-formed.
+        """
+        games = list(games)
+        done = 0
+        try:
+            for result in self._executor.map(_solve_item, games, chunksize=chunksize):
+                done += 1
+                yield result
+        except BrokenProcessPool:
+            self.broken = True
+            for _ in games[done:]:
+                yield {'success': False, 'message': 'Error: a batch worker stopped unexpectedly. Please retry.'}
+
+    def close(self):
+        self._executor.shutdown()
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def solve_batch(games, world=None, max_workers=None, chunksize=DEFAULT_CHUNKSIZE):
+    """Solve a list of games on a temporary process pool, yielding results in input order."""
+    if world is None:
+        from world_store import get_world
+        world = get_world()
+    with BatchSolver(world, max_workers) as solver:
+        yield from solver.solve(games, chunksize)
+
+# Long-lived pool for the Flask endpoint, rebuilt when the world data is reloaded or a worker died
+_shared_solver = None
+_shared_solver_lock = threading.Lock()
+
+def get_batch_solver(world):
+    """Return the process-wide BatchSolver for this world, starting it on first use."""
+    global _shared_solver
+    with _shared_solver_lock:
+        if _shared_solver is None or _shared_solver.world is not world or _shared_solver.broken:
+            if _shared_solver is not None:
+                _shared_solver.close()
+            _shared_solver = BatchSolver(world, max_workers=int(os.environ.get('BATCH_WORKERS', 0)) or None)
+        return _shared_solver
+
+@atexit.register
+def _close_shared_solver():
+    if _shared_solver is not None:
+        _shared_solver.close()
@@ -0,0 +1,250 @@
+# benchmark.py
+"""
+Headless benchmark: replays every (start, target) game through the solver.
+
+Clues are generated from an independent reference, not from the pair tables
+the solver reads: border distances are the exhaustive spherical minimum over
+boundaries densified to about 2 km (geodesic.reference_border_distances), and
+directions the azimuth between the closest points found there, or the bearing
+between centroids for neighbours. Each game is then played the way a user would
+play it: enter the clue, try the suggested country, repeat. A <10km answer
+lists the matching neighbours, which the player tries in order. No network
+access is needed.
+
+    python benchmark.py --mode latest
+    python benchmark.py --mode expert --starts france,brazil --json results.json
+    python benchmark.py --mode constrained --baseline latest
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+import numpy as np
+import shapely
+from pyproj import Geod
+from functools import partial
+from geodesic import reference_border_distances
+from geometry import DIRECTIONS, bearings_to_octants, calculate_bearings, nearest_bearings_to_octants
+from lookahead import best_guess
+from solver import (
+    NEIGHBOR_KM, find_best_guess, neighbors_in_direction, constrained_guess,
+    initial_candidates, SOLVER_MODES,
+)
+from world_store import DEFAULT_WORLD_DATA_PATH, WorldStore
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+DEFAULT_MAX_GUESSES = 20
+
+def true_clues(world):
+    """
+    (distance, octant) clue matrices for every (guess, target) pair, from the
+    full-resolution shapes rather than the pair tables.
+    """
+    geometries = np.asarray(list(world.frame.geometry), dtype=object)
+    distance_km, own, other = reference_border_distances(geometries)
+    # Direction of the shortest path between the closest points
+    azimuth, _, _ = Geod(ellps='WGS84').inv(own[..., 0].ravel(), own[..., 1].ravel(),
+                                             other[..., 0].ravel(), other[..., 1].ravel())
+    nearest_octant = nearest_bearings_to_octants(np.mod(azimuth, 360)).reshape(distance_km.shape)
+    centroids = shapely.get_coordinates(shapely.centroid(geometries))[:, ::-1]
+    centroid_octant = np.vstack([bearings_to_octants(calculate_bearings(point, centroids)) for point in centroids])
+
+    adjacent = distance_km < NEIGHBOR_KM
+    distances = np.where(adjacent, 0, np.round(distance_km))
+    octants = np.where(adjacent, centroid_octant, nearest_octant)
+    return distances, octants
+
+def play_game(world, start, target, clues, mode='latest', max_guesses=DEFAULT_MAX_GUESSES,
+              find_guess=find_best_guess):
+    """
+    Play one game from start until target is guessed. find_guess answers the
+    latest-mode clues; response_cache passes a cached version to prewarm.
+
+    Returns (guesses, latencies): the number of guesses including the start
+    (None if the solver gave up or ran out of guesses) and the solver time
+    in seconds for every clue it answered.
+    """
+    tables = world.tables
+    clue_km, clue_octant = clues
+    target_name = tables.names[target]
+    candidates = initial_candidates(tables)
+    choose = partial(best_guess, opening_book=world.opening_book)
+    latencies = []
+    current = start
+    guesses = 1
+
+    while tables.names[current] != target_name:
+        if guesses >= max_guesses:
+            return None, latencies
+        current_name = tables.names[current]
+        distance = int(clue_km[current, target])
+        direction = DIRECTIONS[clue_octant[current, target]]
+
+        started = time.perf_counter()
+        if mode == 'latest' and distance == 0:
+            result = neighbors_in_direction(world, current_name, direction)
+            latencies.append(time.perf_counter() - started)
+            # The player works through the listed neighbours in order
+            names = [name.lower() for name in result.get('neighboring_countries', [])]
+            if target_name not in names:
+                return None, latencies
+            return guesses + names.index(target_name) + 1, latencies
+        if mode == 'latest':
+            next_guess = find_guess(world, current_name, distance, direction)
+        elif mode == 'constrained':
+            next_guess, candidates = constrained_guess(world, candidates, current_name, distance, direction)
+        else:
+            next_guess, candidates = constrained_guess(world, candidates, current_name, distance, direction,
+                                                       choose=choose)
+        latencies.append(time.perf_counter() - started)
+
+        if next_guess is None:
+            return None, latencies
+        current = tables.index_of(next_guess)
+        guesses += 1
+
+    return guesses, latencies
+
+def run_benchmark(world, mode='latest', starts=None, max_guesses=DEFAULT_MAX_GUESSES, clues=None,
+                  trace_memory=False, find_guess=find_best_guess):
+    """Replay every (start, target) game and collect the raw results."""
+    tables = world.tables
+    if clues is None:
+        clues = true_clues(world)
+    rows = list(range(len(tables)))
+    start_rows = rows if starts is None else [tables.index_of(name) for name in starts]
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    games = []
+    latencies = []
+    for start in start_rows:
+        for target in rows:
+            if target == start:
+                continue
+            guesses, game_latencies = play_game(world, start, target, clues, mode, max_guesses, find_guess)
+            games.append((str(tables.names[start]), str(tables.names[target]), guesses))
+            latencies.extend(game_latencies)
+    elapsed = time.perf_counter() - started
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        'mode': mode,
+        'games': games,
+        'latencies': latencies,
+        'elapsed': elapsed,
+        'traced_peak_bytes': traced_peak,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, if the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if peak > 1 << 32 else peak * 1024
+
+def summarize(results):
+    """Guesses-to-solve distribution, failure rate and latency percentiles."""
+    solved = [guesses for _, _, guesses in results['games'] if guesses is not None]
+    games = len(results['games'])
+    latencies = np.array(results['latencies']) * 1000
+    distribution = {}
+    for guesses in sorted(solved):
+        distribution[guesses] = distribution.get(guesses, 0) + 1
+
+    summary = {
+        'mode': results['mode'],
+        'games': games,
+        'solved': len(solved),
+        'failure_rate': (games - len(solved)) / games if games else 0.0,
+        'mean_guesses': float(np.mean(solved)) if solved else None,
+        'guess_distribution': distribution,
+        'solver_calls': len(latencies),
+        'elapsed_s': results['elapsed'],
+        'peak_rss_bytes': results['peak_rss_bytes'],
+        'traced_peak_bytes': results['traced_peak_bytes'],
+    }
+    for p in (50, 95, 99):
+        summary[f'latency_p{p}_ms'] = float(np.percentile(latencies, p)) if len(latencies) else None
+    return summary
+
+def format_report(summary):
+    lines = [
+        f"Mode: {summary['mode']}",
+        f"Games: {summary['games']}  solved: {summary['solved']}  failure rate: {summary['failure_rate']:.2%}",
+    ]
+    if summary['mean_guesses'] is not None:
+        lines.append(f"Mean guesses to solve: {summary['mean_guesses']:.3f}")
+        lines.append("Guesses to solve:")
+        for guesses, count in summary['guess_distribution'].items():
+            lines.append(f"  {guesses:>3}: {count}")
+    if summary['solver_calls']:
+        lines.append(
+            f"Per-guess latency over {summary['solver_calls']} calls: "
+            f"p50 {summary['latency_p50_ms']:.3f} ms, p95 {summary['latency_p95_ms']:.3f} ms, "
+            f"p99 {summary['latency_p99_ms']:.3f} ms"
+        )
+    lines.append(f"Replay time: {summary['elapsed_s']:.2f} s")
+    if summary['peak_rss_bytes'] is not None:
+        lines.append(f"Peak RSS: {summary['peak_rss_bytes'] / 2**20:.1f} MiB")
+    if summary['traced_peak_bytes'] is not None:
+        lines.append(f"Peak traced Python allocations during replay: {summary['traced_peak_bytes'] / 2**20:.1f} MiB")
+    return '\n'.join(lines)
+
+def regressions(summary, baseline):
+    """Ways summary does worse than the baseline run: more failures or more guesses."""
+    problems = []
+    if summary['failure_rate'] > baseline['failure_rate']:
+        problems.append(f"failure rate {summary['failure_rate']:.2%} > {baseline['failure_rate']:.2%}")
+    mean, baseline_mean = summary['mean_guesses'], baseline['mean_guesses']
+    if baseline_mean is not None and (mean is None or mean > baseline_mean):
+        problems.append(f"mean guesses {mean} > {baseline_mean:.3f}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay every (start, target) Globle game through the solver.')
+    parser.add_argument('--world', default=DEFAULT_WORLD_DATA_PATH, help='countries GeoJSON to load')
+    parser.add_argument('--mode', choices=SOLVER_MODES, default='latest')
+    parser.add_argument('--starts', help='comma-separated start countries (default: all)')
+    parser.add_argument('--max-guesses', type=int, default=DEFAULT_MAX_GUESSES)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also measure peak Python allocations with tracemalloc (slows the replay)')
+    parser.add_argument('--json', help='write the summary and every game result to this file')
+    parser.add_argument('--baseline', choices=SOLVER_MODES,
+                        help='also replay this mode and exit with status 1 if --mode does worse')
+    args = parser.parse_args()
+
+    world = WorldStore(args.world, allow_download=False).load()
+    starts = [name.strip() for name in args.starts.split(',')] if args.starts else None
+    clues = true_clues(world)
+    results = run_benchmark(world, args.mode, starts, args.max_guesses, clues, trace_memory=args.trace_memory)
+    summary = summarize(results)
+    print(format_report(summary))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'summary': summary, 'games': results['games']}, f, indent=2)
+
+    if args.baseline:
+        baseline = summarize(run_benchmark(world, args.baseline, starts, args.max_guesses, clues))
+        print(f"\nBaseline {args.baseline}: failure rate {baseline['failure_rate']:.2%}, "
+              f"mean guesses {baseline['mean_guesses']:.3f}")
+        problems = regressions(summary, baseline)
+        if problems:
+            print(f"{args.mode} does worse than {args.baseline}: " + '; '.join(problems))
+            sys.exit(1)
+        print(f"{args.mode} is no worse than {args.baseline}")
+
+if __name__ == '__main__':
+    main()
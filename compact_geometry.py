@@ -0,0 +1,135 @@
+# compact_geometry.py
+"""
+Array-backed country shapes.
+
+CompactGeometry keeps everything the clue calculations need from the
+GeoDataFrame in a few contiguous NumPy arrays, so hot loops never touch
+shapely objects and worker processes can share or memory-map them:
+
+    centroids      (N, 2) float64  centroid (lat, lon), as get_centroid_coords
+    bounds         (N, 4) float64  bounding box (minx, miny, maxx, maxy)
+    coords         (T, 2) float64  every ring vertex (lon, lat), one flat buffer
+    ring_offsets   (R + 1,)        ring r is coords[ring_offsets[r]:ring_offsets[r + 1]]
+    country_rings  (N + 1,)        country i owns rings country_rings[i]:country_rings[i + 1]
+
+Distance/prepare_data.py writes the full-resolution shapes and a
+Douglas-Peucker simplified copy to countries_shapes.npz.
+"""
+import os
+import numpy as np
+import shapely
+
+SHAPES_FILENAME = 'countries_shapes.npz'
+SIMPLIFY_DEGREES = 0.1
+
+class CompactGeometry:
+    ARRAYS = ('centroids', 'bounds', 'coords', 'ring_offsets', 'country_rings')
+
+    def __init__(self, centroids, bounds, coords, ring_offsets, country_rings):
+        self.centroids = centroids
+        self.bounds = bounds
+        self.coords = coords
+        self.ring_offsets = ring_offsets
+        self.country_rings = country_rings
+
+    def __len__(self):
+        return len(self.centroids)
+
+    @classmethod
+    def from_geometries(cls, geometries):
+        geometries = np.asarray(list(geometries), dtype=object)
+        centroid_points = shapely.centroid(geometries)
+        centroids = np.column_stack((shapely.get_y(centroid_points), shapely.get_x(centroid_points)))
+        parts, part_owner = shapely.get_parts(geometries, return_index=True)
+        rings, ring_part = shapely.get_rings(parts, return_index=True)
+        ring_owner = part_owner[ring_part]
+        coords, vertex_owner = shapely.get_coordinates(rings, return_index=True)
+        return cls(
+            centroids=centroids,
+            bounds=shapely.bounds(geometries),
+            coords=coords,
+            ring_offsets=np.searchsorted(vertex_owner, np.arange(len(rings) + 1)),
+            country_rings=np.searchsorted(ring_owner, np.arange(len(geometries) + 1)),
+        )
+
+    @property
+    def vertex_offsets(self):
+        """Country i's vertices are coords[vertex_offsets[i]:vertex_offsets[i + 1]]."""
+        return self.ring_offsets[self.country_rings]
+
+    def vertices(self, country):
+        offsets = self.vertex_offsets
+        return self.coords[offsets[country]:offsets[country + 1]]
+
+    def densified(self, max_degrees):
+        """
+        Boundary vertices with extra points so no segment is longer than
+        max_degrees, packed as (coords, vertex_offsets). Segments are split
+        into equal parts, like shapely.segmentize.
+        """
+        starts, ends = self.ring_offsets[:-1], self.ring_offsets[1:]
+        # Segment k runs from vertex k to k + 1, except across ring boundaries
+        is_segment = np.ones(len(self.coords), dtype=bool)
+        is_segment[ends - 1] = False
+        segment_start = np.flatnonzero(is_segment)
+        delta = self.coords[segment_start + 1] - self.coords[segment_start]
+        parts = np.maximum(np.ceil(np.hypot(delta[:, 0], delta[:, 1]) / max_degrees), 1).astype(np.int64)
+
+        # Each vertex emits itself plus the interior points of the segment it starts
+        emitted = np.ones(len(self.coords), dtype=np.int64)
+        emitted[segment_start] = parts
+        first = np.concatenate(([0], np.cumsum(emitted)))
+        step = np.arange(first[-1]) - np.repeat(first[:-1], emitted)
+        source = np.repeat(np.arange(len(self.coords)), emitted)
+
+        fraction = np.zeros(len(self.coords))
+        fraction_step = np.zeros((len(self.coords), 2))
+        fraction[segment_start] = 1 / parts
+        fraction_step[segment_start] = delta
+        dense = self.coords[source] + fraction_step[source] * (step * fraction[source])[:, None]
+        return dense, first[self.vertex_offsets]
+
+    def simplified(self, tolerance=SIMPLIFY_DEGREES):
+        """Douglas-Peucker simplified copy, for coarse pruning and the static site."""
+        rings = [
+            shapely.simplify(shapely.linearrings(self.coords[start:end]), tolerance, preserve_topology=True)
+            for start, end in zip(self.ring_offsets[:-1], self.ring_offsets[1:])
+        ]
+        coords, vertex_owner = shapely.get_coordinates(rings, return_index=True)
+        return CompactGeometry(
+            centroids=self.centroids,
+            bounds=self.bounds,
+            coords=coords,
+            ring_offsets=np.searchsorted(vertex_owner, np.arange(len(rings) + 1)),
+            country_rings=self.country_rings,
+        )
+
+    def save(self, path, names, simplified=None, stamp=None):
+        arrays = {field: getattr(self, field) for field in self.ARRAYS}
+        if simplified is not None:
+            arrays.update({f'simplified_{field}': getattr(simplified, field) for field in ('coords', 'ring_offsets')})
+        if stamp:
+            arrays['build_stamp'] = np.str_(stamp)
+        np.savez_compressed(path, names=np.asarray(list(names), dtype=str), **arrays)
+
+    @classmethod
+    def load(cls, path, simplified=False):
+        """Load the saved shapes (or their simplified copy), plus the names they were built for."""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {field: data[field] for field in cls.ARRAYS}
+            if simplified:
+                arrays['coords'] = data['simplified_coords']
+                arrays['ring_offsets'] = data['simplified_ring_offsets']
+            return cls(**arrays), data['names']
+
+def load_or_build_compact_geometry(path, names, geometries):
+    """Load the prebuilt shapes (path None skips them), rebuilding them in-process if missing or stale."""
+    if path and os.path.exists(path):
+        try:
+            compact, saved_names = CompactGeometry.load(path)
+            if saved_names.tolist() == list(names):
+                return compact
+            print(f"'{path}' does not match the loaded countries, rebuilding compact shapes.")
+        except Exception as e:
+            print(f"Could not read '{path}' ({e}), rebuilding compact shapes.")
+    return CompactGeometry.from_geometries(geometries)
@@ -0,0 +1,387 @@
+# country_names.py
+"""
+Country-name resolution.
+
+CountryNameIndex maps canonical names, common aliases and ISO 3166 codes to
+rows with a plain dictionary lookup. Only when that misses does it fall back
+to fuzzy matching: a trigram index narrows the names down to a few
+candidates, difflib confirms the best one, and the outcome is memoized.
+"""
+import re
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+# This set is used to filter and standardize country names from the map data.
+VALID_COUNTRIES = {
+    'afghanistan', 'albania', 'algeria', 'andorra', 'angola', 'antigua and barbuda', 'argentina', 
+    'armenia', 'australia', 'austria', 'azerbaijan', 'bahamas', 'bahrain', 'bangladesh', 
+    'barbados', 'belarus', 'belgium', 'belize', 'benin', 'bhutan', 'bolivia', 
+    'bosnia and herzegovina', 'botswana', 'brazil', 'brunei', 'bulgaria', 'burkina faso', 
+    'burundi', 'cambodia', 'cameroon', 'canada', 'cape verde', 'central african republic', 
+    'chad', 'chile', 'china', 'colombia', 'comoros', 'congo', 'costa rica', 'croatia', 
+    'cuba', 'cyprus', 'czech republic', 'democratic republic of the congo', 'denmark', 
+    'djibouti', 'dominica', 'dominican republic', 'ecuador', 'egypt', 'el salvador', 
+    'equatorial guinea', 'eritrea', 'estonia', 'eswatini', 'ethiopia', 'fiji', 'finland', 
+    'france', 'gabon', 'gambia', 'georgia', 'germany', 'ghana', 'greece', 'grenada', 
+    'guatemala', 'guinea', 'guinea-bissau', 'guyana', 'haiti', 'honduras', 'hungary', 
+    'iceland', 'india', 'indonesia', 'iran', 'iraq', 'ireland', 'israel', 'italy', 
+    'ivory coast', 'jamaica', 'japan', 'jordan', 'kazakhstan', 'kenya', 'kiribati', 
+    'kuwait', 'kyrgyzstan', 'laos', 'latvia', 'lebanon', 'lesotho', 'liberia', 'libya', 
+    'liechtenstein', 'lithuania', 'luxembourg', 'madagascar', 'malawi', 'malaysia', 
+    'maldives', 'mali', 'malta', 'marshall islands', 'mauritania', 'mauritius', 'mexico', 
+    'micronesia', 'moldova', 'monaco', 'mongolia', 'montenegro', 'morocco', 'mozambique', 
+    'myanmar', 'namibia', 'nauru', 'nepal', 'netherlands', 'new zealand', 'nicaragua', 
+    'niger', 'nigeria', 'north korea', 'north macedonia', 'norway', 'oman', 'pakistan', 
+    'palau', 'palestine', 'panama', 'papua new guinea', 'paraguay', 'peru', 'philippines', 
+    'poland', 'portugal', 'qatar', 'romania', 'russia', 'rwanda', 'saint kitts and nevis', 
+    'saint lucia', 'saint vincent and the grenadines', 'samoa', 'san marino', 
+    'sao tome and principe', 'saudi arabia', 'senegal', 'serbia', 'seychelles', 
+    'sierra leone', 'singapore', 'slovakia', 'slovenia', 'solomon islands', 'somalia', 
+    'south africa', 'south korea', 'south sudan', 'spain', 'sri lanka', 'sudan', 'suriname', 
+    'sweden', 'switzerland', 'syria', 'taiwan', 'tajikistan', 'tanzania', 'thailand', 
+    'timor-leste', 'togo', 'tonga', 'trinidad and tobago', 'tunisia', 'turkey', 
+    'turkmenistan', 'tuvalu', 'uganda', 'ukraine', 'united arab emirates', 
+    'united kingdom', 'united states', 'uruguay', 'uzbekistan', 'vanuatu', 
+    'vatican city', 'venezuela', 'vietnam', 'yemen', 'zambia', 'zimbabwe'
+}
+
+# Common alternative and Natural Earth spellings, keyed by the canonical name
+COUNTRY_ALIASES = {
+    'united states': ['united states of america', 'america'],
+    'united kingdom': ['uk', 'great britain', 'britain'],
+    'ivory coast': ["cote d'ivoire"],
+    'czech republic': ['czechia'],
+    'democratic republic of the congo': ['dem. rep. congo', 'dr congo', 'drc', 'democratic republic of congo', 'congo-kinshasa'],
+    'congo': ['republic of the congo', 'republic of congo', 'congo-brazzaville'],
+    'eswatini': ['swaziland'],
+    'north macedonia': ['macedonia'],
+    'myanmar': ['burma'],
+    'timor-leste': ['east timor'],
+    'turkey': ['türkiye'],
+    'cape verde': ['cabo verde'],
+    'bosnia and herzegovina': ['bosnia and herz.', 'bosnia'],
+    'central african republic': ['central african rep.'],
+    'dominican republic': ['dominican rep.'],
+    'equatorial guinea': ['eq. guinea'],
+    'south sudan': ['s. sudan'],
+    'solomon islands': ['solomon is.'],
+    'marshall islands': ['marshall is.'],
+    'south korea': ['republic of korea', 'korea'],
+    'north korea': ["democratic people's republic of korea", 'dprk'],
+    'russia': ['russian federation'],
+    'laos': ['lao pdr'],
+    'vietnam': ['viet nam'],
+    'syria': ['syrian arab republic'],
+    'iran': ['islamic republic of iran'],
+    'vatican city': ['vatican', 'holy see'],
+    'saint kitts and nevis': ['st. kitts and nevis'],
+    'saint lucia': ['st. lucia'],
+    'saint vincent and the grenadines': ['st. vincent and the grenadines', 'st. vin. and gren.'],
+    'micronesia': ['federated states of micronesia'],
+    'brunei': ['brunei darussalam'],
+    'united arab emirates': ['uae'],
+    'netherlands': ['holland'],
+    'moldova': ['republic of moldova'],
+    'tanzania': ['united republic of tanzania'],
+    'palestine': ['state of palestine'],
+    'antigua and barbuda': ['antigua and barb.'],
+}
+
+# ISO 3166-1 alpha-2 and alpha-3 codes
+ISO_CODES = {
+    'afghanistan': ('AF', 'AFG'),
+    'albania': ('AL', 'ALB'),
+    'algeria': ('DZ', 'DZA'),
+    'andorra': ('AD', 'AND'),
+    'angola': ('AO', 'AGO'),
+    'antigua and barbuda': ('AG', 'ATG'),
+    'argentina': ('AR', 'ARG'),
+    'armenia': ('AM', 'ARM'),
+    'australia': ('AU', 'AUS'),
+    'austria': ('AT', 'AUT'),
+    'azerbaijan': ('AZ', 'AZE'),
+    'bahamas': ('BS', 'BHS'),
+    'bahrain': ('BH', 'BHR'),
+    'bangladesh': ('BD', 'BGD'),
+    'barbados': ('BB', 'BRB'),
+    'belarus': ('BY', 'BLR'),
+    'belgium': ('BE', 'BEL'),
+    'belize': ('BZ', 'BLZ'),
+    'benin': ('BJ', 'BEN'),
+    'bhutan': ('BT', 'BTN'),
+    'bolivia': ('BO', 'BOL'),
+    'bosnia and herzegovina': ('BA', 'BIH'),
+    'botswana': ('BW', 'BWA'),
+    'brazil': ('BR', 'BRA'),
+    'brunei': ('BN', 'BRN'),
+    'bulgaria': ('BG', 'BGR'),
+    'burkina faso': ('BF', 'BFA'),
+    'burundi': ('BI', 'BDI'),
+    'cambodia': ('KH', 'KHM'),
+    'cameroon': ('CM', 'CMR'),
+    'canada': ('CA', 'CAN'),
+    'cape verde': ('CV', 'CPV'),
+    'central african republic': ('CF', 'CAF'),
+    'chad': ('TD', 'TCD'),
+    'chile': ('CL', 'CHL'),
+    'china': ('CN', 'CHN'),
+    'colombia': ('CO', 'COL'),
+    'comoros': ('KM', 'COM'),
+    'congo': ('CG', 'COG'),
+    'costa rica': ('CR', 'CRI'),
+    'croatia': ('HR', 'HRV'),
+    'cuba': ('CU', 'CUB'),
+    'cyprus': ('CY', 'CYP'),
+    'czech republic': ('CZ', 'CZE'),
+    'democratic republic of the congo': ('CD', 'COD'),
+    'denmark': ('DK', 'DNK'),
+    'djibouti': ('DJ', 'DJI'),
+    'dominica': ('DM', 'DMA'),
+    'dominican republic': ('DO', 'DOM'),
+    'ecuador': ('EC', 'ECU'),
+    'egypt': ('EG', 'EGY'),
+    'el salvador': ('SV', 'SLV'),
+    'equatorial guinea': ('GQ', 'GNQ'),
+    'eritrea': ('ER', 'ERI'),
+    'estonia': ('EE', 'EST'),
+    'eswatini': ('SZ', 'SWZ'),
+    'ethiopia': ('ET', 'ETH'),
+    'fiji': ('FJ', 'FJI'),
+    'finland': ('FI', 'FIN'),
+    'france': ('FR', 'FRA'),
+    'gabon': ('GA', 'GAB'),
+    'gambia': ('GM', 'GMB'),
+    'georgia': ('GE', 'GEO'),
+    'germany': ('DE', 'DEU'),
+    'ghana': ('GH', 'GHA'),
+    'greece': ('GR', 'GRC'),
+    'grenada': ('GD', 'GRD'),
+    'guatemala': ('GT', 'GTM'),
+    'guinea': ('GN', 'GIN'),
+    'guinea-bissau': ('GW', 'GNB'),
+    'guyana': ('GY', 'GUY'),
+    'haiti': ('HT', 'HTI'),
+    'honduras': ('HN', 'HND'),
+    'hungary': ('HU', 'HUN'),
+    'iceland': ('IS', 'ISL'),
+    'india': ('IN', 'IND'),
+    'indonesia': ('ID', 'IDN'),
+    'iran': ('IR', 'IRN'),
+    'iraq': ('IQ', 'IRQ'),
+    'ireland': ('IE', 'IRL'),
+    'israel': ('IL', 'ISR'),
+    'italy': ('IT', 'ITA'),
+    'ivory coast': ('CI', 'CIV'),
+    'jamaica': ('JM', 'JAM'),
+    'japan': ('JP', 'JPN'),
+    'jordan': ('JO', 'JOR'),
+    'kazakhstan': ('KZ', 'KAZ'),
+    'kenya': ('KE', 'KEN'),
+    'kiribati': ('KI', 'KIR'),
+    'kuwait': ('KW', 'KWT'),
+    'kyrgyzstan': ('KG', 'KGZ'),
+    'laos': ('LA', 'LAO'),
+    'latvia': ('LV', 'LVA'),
+    'lebanon': ('LB', 'LBN'),
+    'lesotho': ('LS', 'LSO'),
+    'liberia': ('LR', 'LBR'),
+    'libya': ('LY', 'LBY'),
+    'liechtenstein': ('LI', 'LIE'),
+    'lithuania': ('LT', 'LTU'),
+    'luxembourg': ('LU', 'LUX'),
+    'madagascar': ('MG', 'MDG'),
+    'malawi': ('MW', 'MWI'),
+    'malaysia': ('MY', 'MYS'),
+    'maldives': ('MV', 'MDV'),
+    'mali': ('ML', 'MLI'),
+    'malta': ('MT', 'MLT'),
+    'marshall islands': ('MH', 'MHL'),
+    'mauritania': ('MR', 'MRT'),
+    'mauritius': ('MU', 'MUS'),
+    'mexico': ('MX', 'MEX'),
+    'micronesia': ('FM', 'FSM'),
+    'moldova': ('MD', 'MDA'),
+    'monaco': ('MC', 'MCO'),
+    'mongolia': ('MN', 'MNG'),
+    'montenegro': ('ME', 'MNE'),
+    'morocco': ('MA', 'MAR'),
+    'mozambique': ('MZ', 'MOZ'),
+    'myanmar': ('MM', 'MMR'),
+    'namibia': ('NA', 'NAM'),
+    'nauru': ('NR', 'NRU'),
+    'nepal': ('NP', 'NPL'),
+    'netherlands': ('NL', 'NLD'),
+    'new zealand': ('NZ', 'NZL'),
+    'nicaragua': ('NI', 'NIC'),
+    'niger': ('NE', 'NER'),
+    'nigeria': ('NG', 'NGA'),
+    'north korea': ('KP', 'PRK'),
+    'north macedonia': ('MK', 'MKD'),
+    'norway': ('NO', 'NOR'),
+    'oman': ('OM', 'OMN'),
+    'pakistan': ('PK', 'PAK'),
+    'palau': ('PW', 'PLW'),
+    'palestine': ('PS', 'PSE'),
+    'panama': ('PA', 'PAN'),
+    'papua new guinea': ('PG', 'PNG'),
+    'paraguay': ('PY', 'PRY'),
+    'peru': ('PE', 'PER'),
+    'philippines': ('PH', 'PHL'),
+    'poland': ('PL', 'POL'),
+    'portugal': ('PT', 'PRT'),
+    'qatar': ('QA', 'QAT'),
+    'romania': ('RO', 'ROU'),
+    'russia': ('RU', 'RUS'),
+    'rwanda': ('RW', 'RWA'),
+    'saint kitts and nevis': ('KN', 'KNA'),
+    'saint lucia': ('LC', 'LCA'),
+    'saint vincent and the grenadines': ('VC', 'VCT'),
+    'samoa': ('WS', 'WSM'),
+    'san marino': ('SM', 'SMR'),
+    'sao tome and principe': ('ST', 'STP'),
+    'saudi arabia': ('SA', 'SAU'),
+    'senegal': ('SN', 'SEN'),
+    'serbia': ('RS', 'SRB'),
+    'seychelles': ('SC', 'SYC'),
+    'sierra leone': ('SL', 'SLE'),
+    'singapore': ('SG', 'SGP'),
+    'slovakia': ('SK', 'SVK'),
+    'slovenia': ('SI', 'SVN'),
+    'solomon islands': ('SB', 'SLB'),
+    'somalia': ('SO', 'SOM'),
+    'south africa': ('ZA', 'ZAF'),
+    'south korea': ('KR', 'KOR'),
+    'south sudan': ('SS', 'SSD'),
+    'spain': ('ES', 'ESP'),
+    'sri lanka': ('LK', 'LKA'),
+    'sudan': ('SD', 'SDN'),
+    'suriname': ('SR', 'SUR'),
+    'sweden': ('SE', 'SWE'),
+    'switzerland': ('CH', 'CHE'),
+    'syria': ('SY', 'SYR'),
+    'taiwan': ('TW', 'TWN'),
+    'tajikistan': ('TJ', 'TJK'),
+    'tanzania': ('TZ', 'TZA'),
+    'thailand': ('TH', 'THA'),
+    'timor-leste': ('TL', 'TLS'),
+    'togo': ('TG', 'TGO'),
+    'tonga': ('TO', 'TON'),
+    'trinidad and tobago': ('TT', 'TTO'),
+    'tunisia': ('TN', 'TUN'),
+    'turkey': ('TR', 'TUR'),
+    'turkmenistan': ('TM', 'TKM'),
+    'tuvalu': ('TV', 'TUV'),
+    'uganda': ('UG', 'UGA'),
+    'ukraine': ('UA', 'UKR'),
+    'united arab emirates': ('AE', 'ARE'),
+    'united kingdom': ('GB', 'GBR'),
+    'united states': ('US', 'USA'),
+    'uruguay': ('UY', 'URY'),
+    'uzbekistan': ('UZ', 'UZB'),
+    'vanuatu': ('VU', 'VUT'),
+    'vatican city': ('VA', 'VAT'),
+    'venezuela': ('VE', 'VEN'),
+    'vietnam': ('VN', 'VNM'),
+    'yemen': ('YE', 'YEM'),
+    'zambia': ('ZM', 'ZMB'),
+    'zimbabwe': ('ZW', 'ZWE'),
+}
+
+FUZZY_CUTOFF = 0.75
+# Stricter cutoff for what players type, so 'narnia' is not taken for 'armenia'
+INPUT_FUZZY_CUTOFF = 0.8
+FUZZY_CANDIDATES = 8
+FUZZY_CACHE_SIZE = 4096
+
+def normalize_name(text):
+    """Lowercase, strip accents and punctuation, so 'Côte d'Ivoire' and 'cote divoire' share a key."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = text.replace('&', ' and ')
+    text = re.sub(r"[.,'’()]", '', text)
+    text = re.sub(r'[\s-]+', ' ', text).strip()
+    if text.startswith('the '):
+        text = text[4:]
+    return text
+
+def _trigrams(key):
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class CountryNameIndex:
+    """
+    Resolve free-form country names to rows of a country list.
+
+    names are the canonical lowercase names in row order; a name listed more
+    than once resolves to its first row.
+    """
+
+    def __init__(self, names, cutoff=FUZZY_CUTOFF):
+        self.names = list(names)
+        self.cutoff = cutoff
+        self.exact = {}
+        for row, name in enumerate(self.names):
+            self.exact.setdefault(normalize_name(name), row)
+
+        # Aliases and names take part in fuzzy matching, ISO codes are too short to
+        for canonical, aliases in COUNTRY_ALIASES.items():
+            row = self.exact.get(normalize_name(canonical))
+            if row is not None:
+                for alias in aliases:
+                    self.exact.setdefault(normalize_name(alias), row)
+        fuzzy_keys = list(self.exact)
+
+        for canonical, codes in ISO_CODES.items():
+            row = self.exact.get(normalize_name(canonical))
+            if row is not None:
+                for code in codes:
+                    self.exact.setdefault(code.lower(), row)
+
+        self._trigram_index = {}
+        for key in fuzzy_keys:
+            for trigram in _trigrams(key):
+                self._trigram_index.setdefault(trigram, []).append(key)
+        self._fuzzy = lru_cache(maxsize=FUZZY_CACHE_SIZE)(self._fuzzy_lookup)
+
+    def _fuzzy_lookup(self, key):
+        shared = Counter()
+        for trigram in _trigrams(key):
+            shared.update(self._trigram_index.get(trigram, ()))
+        best_row, best_ratio = None, self.cutoff
+        for candidate, _ in shared.most_common(FUZZY_CANDIDATES):
+            ratio = SequenceMatcher(None, key, candidate).ratio()
+            if ratio >= best_ratio and (best_row is None or ratio > best_ratio):
+                best_row, best_ratio = self.exact[candidate], ratio
+        return best_row
+
+    def resolve(self, text, fuzzy=True):
+        """Row for a name, alias, ISO code or (with fuzzy) close misspelling, or None."""
+        key = normalize_name(text)
+        if not key:
+            return None
+        row = self.exact.get(key)
+        if row is None and fuzzy:
+            row = self._fuzzy(key)
+        return row
+
+    def canonical(self, text, fuzzy=True):
+        """Canonical lowercase name for text, or None."""
+        row = self.resolve(text, fuzzy)
+        return self.names[row] if row is not None else None
+
+    def cache_info(self):
+        """functools hit/miss counters for the fuzzy fallback."""
+        return self._fuzzy.cache_info()
+
+# Used once per Natural Earth row, by the server's download fallback and by Distance/prepare_data.py
+_valid_country_index = CountryNameIndex(sorted(VALID_COUNTRIES))
+
+def unify_country_name(raw_name):
+    """
+    Canonical name for a map name, alias or ISO code, or '' if it is not a
+    valid country. No fuzzy matching: it took territories for countries
+    ('Greenland' for grenada, 'Somaliland' for somalia).
+    """
+    return _valid_country_index.canonical(raw_name, fuzzy=False) or ''
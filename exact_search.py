@@ -0,0 +1,208 @@
+# exact_search.py
+"""
+Table-free best-guess search with bounding-box pruning.
+
+find_best_guess reads precomputed distances from the pair tables. When those
+are unavailable or need checking, the distance has to be measured from the
+shapes, and measuring every country that matches the direction is the
+expensive part. This search is a branch-and-bound over the candidates:
+
+1. For every candidate, cheap lower and upper bounds on the border distance
+   are computed from the two bounding boxes (CompactGeometry.bounds).
+2. Candidates are visited in order of the smallest distance difference
+   their bounds allow.
+3. The exact geodesic distance (shapely intersects test plus the closest
+   densified vertex pair measured on WGS84) runs only until the next lower
+   bound cannot beat the best difference found so far.
+
+search_stats() reports how many exact evaluations the queries performed.
+Run it as a script to check it against the table solver.
+"""
+import threading
+import time
+import weakref
+import numpy as np
+import shapely
+from pyproj import Geod
+from geodesic import DENSIFY_DEGREES, EARTH_RADIUS_KM, to_unit_vectors, haversine_km
+from geometry import DIRECTIONS
+from metrics import exact_evaluations_per_query, exact_geometry_operations, timed
+from solver import neighbors_in_direction
+
+# Spherical bounds against ellipsoidal distances differ by under 0.5%
+LOWER_BOUND_FACTOR = 0.99
+UPPER_BOUND_FACTOR = 1.01
+UPPER_BOUND_SLACK_KM = 1.0
+
+_geod = Geod(ellps='WGS84')
+
+def bbox_distance_bounds(bounds, row, others):
+    """
+    Lower bound on the great-circle distance in km between the bounding box
+    of `row` and those of `others`: the smallest latitude and (circular)
+    longitude gaps, combined with the haversine formula at the latitude
+    where a degree of longitude is shortest.
+    """
+    minx, miny, maxx, maxy = bounds[row]
+    o_minx, o_miny, o_maxx, o_maxy = bounds[others].T
+
+    lat_gap = np.maximum(0, np.maximum(o_miny - maxy, miny - o_maxy))
+    direct = np.maximum(o_minx - maxx, minx - o_maxx)
+    wrapped = np.where(o_minx > maxx, minx + 360 - o_maxx, o_minx + 360 - maxx)
+    lon_gap = np.clip(np.minimum(direct, wrapped), 0, 180)
+
+    cos_lat = np.cos(np.radians(max(abs(miny), abs(maxy))))
+    o_cos_lat = np.cos(np.radians(np.maximum(np.abs(o_miny), np.abs(o_maxy))))
+    hav = np.sin(np.radians(lat_gap) / 2) ** 2 + cos_lat * o_cos_lat * np.sin(np.radians(lon_gap) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(hav, 0, 1)))
+
+class ExactDistanceEngine:
+    """Densified vertices and bounds of one World, for on-demand pair distances."""
+
+    def __init__(self, world, densify_degrees=DENSIFY_DEGREES):
+        self.geometries = np.asarray(list(world.frame.geometry), dtype=object)
+        self.bounds = world.compact.bounds
+        self.coords, self.offsets = world.compact.densified(densify_degrees)
+        self.vectors = to_unit_vectors(self.coords)
+        # Any vertex pair is an upper bound on the closest one
+        self.anchors = self.coords[self.offsets[:-1]]
+
+    def distance_bounds(self, row, others):
+        """(lower, upper) bounds in km on the border distance from row to others."""
+        lower = bbox_distance_bounds(self.bounds, row, others) * LOWER_BOUND_FACTOR
+        a, b = self.anchors[row], self.anchors[others]
+        upper = haversine_km(a[0], a[1], b[:, 0], b[:, 1]) * UPPER_BOUND_FACTOR + UPPER_BOUND_SLACK_KM
+        return lower, upper
+
+    def _nearest_pair(self, row, other):
+        """Closest vertex pair (own, other) picked the same way as geodesic_border_distances."""
+        own_start, own_end = self.offsets[row], self.offsets[row + 1]
+        start, end = self.offsets[other], self.offsets[other + 1]
+        dots = self.vectors[own_start:own_end] @ self.vectors[start:end].T
+        own = dots.argmax(axis=0)
+        column = int(dots[own, np.arange(end - start)].argmax())
+        return own_start + own[column], start + column
+
+    def distance(self, row, other):
+        """Border distance in km between two countries, as stored in the pair tables."""
+        if row == other:
+            return 0.0
+        exact_geometry_operations.inc(operation='intersects')
+        if shapely.intersects(self.geometries[row], self.geometries[other]):
+            return 0.0
+        exact_geometry_operations.inc(2, operation='geodesic_inverse')
+        distances = []
+        for a, b in (self._nearest_pair(row, other), self._nearest_pair(other, row)):
+            _, _, metres = _geod.inv(self.coords[a, 0], self.coords[a, 1], self.coords[b, 0], self.coords[b, 1])
+            distances.append(metres / 1000)
+        return float(np.float32(min(distances)))
+
+_engines = weakref.WeakKeyDictionary()
+_engines_lock = threading.Lock()
+
+def engine_for(world):
+    """The ExactDistanceEngine of a World, built on first use."""
+    with _engines_lock:
+        engine = _engines.get(world)
+        if engine is None:
+            engine = _engines[world] = ExactDistanceEngine(world)
+        return engine
+
+_stats = {'queries': 0, 'candidates': 0, 'exact_evaluations': 0}
+_stats_lock = threading.Lock()
+
+def search_stats():
+    """Totals over every query since the last reset."""
+    with _stats_lock:
+        return dict(_stats)
+
+def reset_search_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+def _bounded_match(engine, current, target_distance, mask, stats):
+    """Row with the smallest exact distance difference under mask (first one on ties), or None."""
+    rows = np.flatnonzero(mask)
+    if len(rows) == 0:
+        return None
+    lower, upper = engine.distance_bounds(current, rows)
+    diff_bound = np.maximum(0, np.maximum(lower - target_distance, target_distance - upper))
+    best, best_diff = None, np.inf
+    for i in np.lexsort((rows, diff_bound)):
+        if diff_bound[i] > best_diff:
+            break
+        row = int(rows[i])
+        diff = abs(engine.distance(current, row) - target_distance)
+        stats['exact_evaluations'] += 1
+        if diff < best_diff or (diff == best_diff and row < best):
+            best, best_diff = row, diff
+    stats['candidates'] += len(rows)
+    return best
+
+@timed('find_best_guess_exact')
+def find_best_guess_exact(world, current_country, target_distance, target_direction, stats=None):
+    """
+    find_best_guess with distances measured from the shapes instead of read
+    from world.tables.geodesic_km. Directions still come from the tables.
+    Pass a dict as stats to receive this query's candidate and exact
+    evaluation counts.
+    """
+    tables = world.tables
+    current = tables.index_of(current_country)
+    target_octant = DIRECTIONS.index(target_direction)
+    query = {'candidates': 0, 'exact_evaluations': 0}
+
+    if target_distance == 0:
+        result = neighbors_in_direction(world, current_country, target_direction)
+        guess = result['neighboring_countries'][0] if result['success'] else None
+    else:
+        engine = engine_for(world)
+        candidates = tables.names != tables.names[current]
+        guess = None
+        for octants in (tables.nearest_octant[current], tables.centroid_octant[current]):
+            best = _bounded_match(engine, current, target_distance, candidates & (octants == target_octant), query)
+            if best is not None:
+                guess = tables.names[best].title()
+                break
+
+    exact_evaluations_per_query.observe(query['exact_evaluations'])
+    with _stats_lock:
+        _stats['queries'] += 1
+        _stats['candidates'] += query['candidates']
+        _stats['exact_evaluations'] += query['exact_evaluations']
+    if stats is not None:
+        stats.update(query)
+    return guess
+
+def main():
+    from solver import find_best_guess
+    from world_store import get_world
+    world = get_world()
+    engine_for(world)
+    tables = world.tables
+    distances = (50, 300, 800, 1500, 3000, 6000, 12000)
+    queries = [(name, distance, direction)
+               for name in tables.names.tolist()
+               for distance in distances for direction in DIRECTIONS]
+
+    reset_search_stats()
+    mismatches = 0
+    per_query = []
+    started = time.perf_counter()
+    for name, distance, direction in queries:
+        stats = {}
+        guess = find_best_guess_exact(world, name, distance, direction, stats)
+        per_query.append(stats['exact_evaluations'])
+        mismatches += guess != find_best_guess(world, name, distance, direction)
+    seconds = time.perf_counter() - started
+
+    totals = search_stats()
+    per_query = np.array(per_query)
+    print(f"{totals['queries']} queries, {mismatches} differ from the table solver, {seconds:.1f} s")
+    print(f"Exact evaluations: {totals['exact_evaluations']} of {totals['candidates']} direction matches "
+          f"({totals['exact_evaluations'] / max(totals['candidates'], 1):.1%}); per query mean "
+          f"{per_query.mean():.1f}, p95 {np.percentile(per_query, 95):.0f}, max {per_query.max()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+# game_state.py
+"""
+Server-side game state.
+
+The session cookie only carries a game id; everything else about a game
+lives in a GameStore:
+
+    mode           solver mode ('latest', 'constrained' or 'expert')
+    current_guess  the country the next clue is about
+    clues          history of {'guess', 'distance', 'direction', 'result'}
+    candidates     encode_candidates bitset for constrained/expert games
+
+Each clue keeps the response it produced. A client that names the country
+its clue is about (the 'guess' field of /make-guess) and resubmits the last
+clue, e.g. a retry after a dropped response, gets the same answer back
+without the solver running again. Without 'guess' a resubmission cannot be
+told apart from a new clue and is applied to the current guess.
+
+save(state, expected_updated) is a compare-and-set: it only writes if the
+stored game still has that 'updated' time, so of two concurrent clues for
+the same game only one is applied.
+
+Two backends need no external service: MemoryGameStore (LRU with a TTL,
+per process) and SQLiteGameStore (one database file, shared by every worker
+process on the host). create_game_store picks one from GAME_STORE.
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_GAMES = 10000
+
+class GameState:
+    def __init__(self, game_id, mode, current_guess, clues=None, candidates=None, updated=None):
+        self.game_id = game_id
+        self.mode = mode
+        self.current_guess = current_guess
+        self.clues = clues if clues is not None else []
+        self.candidates = candidates
+        self.updated = updated if updated is not None else time.time()
+
+    @classmethod
+    def new(cls, mode, current_guess, candidates=None):
+        return cls(secrets.token_urlsafe(16), mode, current_guess, candidates=candidates)
+
+    def add_clue(self, distance, direction, result):
+        """Record a clue about current_guess and the response it produced."""
+        self.clues.append({
+            'guess': self.current_guess,
+            'distance': distance,
+            'direction': direction,
+            'result': result,
+        })
+
+    def repeated_result(self, guess, distance, direction):
+        """The recorded response if (guess, distance, direction) is the last clue, else None."""
+        if self.clues:
+            last = self.clues[-1]
+            if (last['guess'].lower(), last['distance'], last['direction']) == (guess.lower(), distance, direction):
+                return last['result']
+        return None
+
+    def to_json(self):
+        return json.dumps({
+            'game_id': self.game_id,
+            'mode': self.mode,
+            'current_guess': self.current_guess,
+            'clues': self.clues,
+            'candidates': self.candidates,
+            'updated': self.updated,
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        return cls(**json.loads(text))
+
+def next_updated(expected_updated):
+    """A new 'updated' time, strictly after expected_updated even if the clock has not moved."""
+    now = time.time()
+    return now if expected_updated is None else max(now, expected_updated + 1e-6)
+
+class MemoryGameStore:
+    """Games kept in this process, least recently used first out, expiring after ttl seconds."""
+
+    def __init__(self, max_games=DEFAULT_MAX_GAMES, ttl=DEFAULT_TTL_SECONDS):
+        self.max_games = max_games
+        self.ttl = ttl
+        self._games = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, game_id):
+        with self._lock:
+            stored = self._games.get(game_id)
+            if stored is None:
+                return None
+            updated, text = stored
+            if time.time() - updated > self.ttl:
+                del self._games[game_id]
+                return None
+            self._games.move_to_end(game_id)
+            return GameState.from_json(text)
+
+    def save(self, state, expected_updated=None):
+        """
+        Store the game. With expected_updated, only if the stored copy still has
+        that 'updated' time; returns False (and stores nothing) otherwise.
+        """
+        with self._lock:
+            if expected_updated is not None:
+                stored = self._games.get(state.game_id)
+                if stored is None or stored[0] != expected_updated:
+                    return False
+            state.updated = next_updated(expected_updated)
+            # Stored serialized so callers never share mutable state between requests
+            self._games[state.game_id] = (state.updated, state.to_json())
+            self._games.move_to_end(state.game_id)
+            while len(self._games) > self.max_games:
+                self._games.popitem(last=False)
+        return True
+
+    def delete(self, game_id):
+        with self._lock:
+            self._games.pop(game_id, None)
+
+    def __len__(self):
+        return len(self._games)
+
+class SQLiteGameStore:
+    """Games in a SQLite file, so several worker processes can serve the same game."""
+
+    def __init__(self, path, ttl=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connection() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS games (game_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)')
+            db.execute('CREATE INDEX IF NOT EXISTS games_updated ON games (updated)')
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def get(self, game_id):
+        row = self._connection().execute(
+            'SELECT state FROM games WHERE game_id = ? AND updated >= ?', (game_id, time.time() - self.ttl)
+        ).fetchone()
+        return GameState.from_json(row[0]) if row else None
+
+    def save(self, state, expected_updated=None):
+        """Same contract as MemoryGameStore.save; the check and the write are one UPDATE."""
+        state.updated = next_updated(expected_updated)
+        with self._connection() as db:
+            if expected_updated is None:
+                db.execute('INSERT OR REPLACE INTO games (game_id, state, updated) VALUES (?, ?, ?)',
+                           (state.game_id, state.to_json(), state.updated))
+            elif db.execute('UPDATE games SET state = ?, updated = ? WHERE game_id = ? AND updated = ?',
+                            (state.to_json(), state.updated, state.game_id, expected_updated)).rowcount == 0:
+                return False
+            db.execute('DELETE FROM games WHERE updated < ?', (state.updated - self.ttl,))
+        return True
+
+    def delete(self, game_id):
+        with self._connection() as db:
+            db.execute('DELETE FROM games WHERE game_id = ?', (game_id,))
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM games').fetchone()[0]
+
+def create_game_store(spec=None):
+    """
+    'memory' (the default) or 'sqlite:<path>'. GAME_STORE_TTL and
+    GAME_STORE_MAX_GAMES override the expiry and the in-memory capacity.
+    """
+    spec = spec or os.environ.get('GAME_STORE', 'memory')
+    ttl = float(os.environ.get('GAME_STORE_TTL', DEFAULT_TTL_SECONDS))
+    if spec == 'memory':
+        return MemoryGameStore(int(os.environ.get('GAME_STORE_MAX_GAMES', DEFAULT_MAX_GAMES)), ttl)
+    if spec.startswith('sqlite:'):
+        return SQLiteGameStore(spec[len('sqlite:'):], ttl)
+    raise ValueError(f"Unknown GAME_STORE '{spec}'. Use 'memory' or 'sqlite:<path>'.")
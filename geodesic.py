@@ -0,0 +1,244 @@
+# geodesic.py
+"""
+Geodesic border distances.
+
+calculate_border_distance measures the planar distance in degrees and calls
+one degree 100 km, which is wrong away from the equator (a degree of
+longitude is ~55 km at 60N). This module computes real distances once for
+every pair of countries:
+
+1. Every boundary of the CompactGeometry is densified to at most
+   DENSIFY_DEGREES between vertices, and the vertices are turned into unit
+   vectors on the sphere.
+2. For each pair, the closest vertex pair is the one with the largest dot
+   product, so the nearest-pair search is a chunked matrix product.
+3. The distance between that vertex pair is measured on the WGS84
+   ellipsoid with pyproj, and touching or overlapping countries get 0.
+   The forward azimuth of the same pair is the nearest-border direction,
+   so it stays right across the antimeridian and near the poles.
+
+Run it as a script to compare accuracy and cost against the old method.
+"""
+import time
+import numpy as np
+import shapely
+from pyproj import Geod
+from compact_geometry import CompactGeometry
+
+DENSIFY_DEGREES = 0.25
+EARTH_RADIUS_KM = 6371.0088
+# Rows of the dot-product matrix computed at once, to bound memory
+CHUNK_ROWS = 256
+# Ground truth for the benchmark: ~2 km vertex spacing, compared in runs of this many vertices
+REFERENCE_DENSIFY_DEGREES = 0.02
+REFERENCE_CHUNK = 32
+
+_geod = Geod(ellps='WGS84')
+
+def to_unit_vectors(coords):
+    """
+    lon/lat degrees to (x, y, z) points on the unit sphere. float32 is enough
+    to pick the closest vertex pair, whose distance is then measured exactly.
+    """
+    lon = np.radians(coords[:, 0])
+    lat = np.radians(coords[:, 1])
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat))).astype(np.float32)
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """Great-circle distance on a spherical Earth, vectorized."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def _nearest_vertex_pairs(vectors, offsets, row):
+    """For country `row`, the (own vertex, other vertex) indexes of the closest pair to every country."""
+    start, end = offsets[row], offsets[row + 1]
+    best_dot = np.full(len(vectors), -np.inf)
+    best_own = np.zeros(len(vectors), dtype=np.int64)
+    for chunk in range(start, end, CHUNK_ROWS):
+        dots = vectors[chunk:min(chunk + CHUNK_ROWS, end)] @ vectors.T
+        own = dots.argmax(axis=0)
+        dot = dots[own, np.arange(len(vectors))]
+        better = dot > best_dot
+        best_dot[better] = dot[better]
+        best_own[better] = own[better] + chunk
+
+    # Reduce over each other country's vertex range: first vertex reaching the maximum
+    segment_max = np.maximum.reduceat(best_dot, offsets[:-1])
+    is_max = best_dot == np.repeat(segment_max, np.diff(offsets))
+    other = np.minimum.reduceat(np.where(is_max, np.arange(len(vectors)), len(vectors)), offsets[:-1])
+    return best_own[other], other
+
+def geodesic_border_distances(geometries, densify_degrees=DENSIFY_DEGREES, compact=None):
+    """
+    (distances, bearings): (N, N) float64 border-to-border distances in km on
+    the WGS84 ellipsoid, and the forward azimuth in degrees [0, 360) from the
+    closest point of the row country to the closest point of the column
+    country. The vertex search runs on the packed CompactGeometry arrays; the
+    shapely geometries are only used for the exact intersects test.
+    """
+    geometries = np.asarray(list(geometries), dtype=object)
+    n = len(geometries)
+    if compact is None:
+        compact = CompactGeometry.from_geometries(geometries)
+    coords, offsets = compact.densified(densify_degrees)
+    vectors = to_unit_vectors(coords)
+
+    distances = np.zeros((n, n))
+    forward = np.zeros((n, n))
+    backward = np.zeros((n, n))
+    for row in range(n):
+        own, other = _nearest_vertex_pairs(vectors, offsets, row)
+        forward[row], backward[row], metres = _geod.inv(coords[own, 0], coords[own, 1],
+                                                         coords[other, 0], coords[other, 1])
+        distances[row] = metres / 1000
+
+    # Vertex choice can differ by direction; keep the closer pair for both, so the
+    # bearing from the other side is that pair's back azimuth
+    use_transpose = distances.T < distances
+    bearings = np.where(use_transpose, backward.T, forward)
+    distances = np.minimum(distances, distances.T)
+
+    # Shared borders and enclaves are 0 apart; the vertex search only approximates that
+    tree = shapely.STRtree(geometries)
+    left, right = tree.query(geometries, predicate='intersects')
+    distances[left, right] = 0
+    return distances, np.mod(bearings, 360)
+
+def _reference_distance_km(geom_a, geom_b, densify_degrees):
+    """Brute-force haversine minimum over finely densified vertices of one pair."""
+    if geom_a.intersects(geom_b):
+        return 0.0
+    coords_a = shapely.get_coordinates(shapely.segmentize(geom_a.boundary, densify_degrees))
+    coords_b = shapely.get_coordinates(shapely.segmentize(geom_b.boundary, densify_degrees))
+    best = np.inf
+    for chunk in range(0, len(coords_a), CHUNK_ROWS):
+        a = coords_a[chunk:chunk + CHUNK_ROWS, None, :]
+        best = min(best, haversine_km(a[..., 0], a[..., 1], coords_b[None, :, 0], coords_b[None, :, 1]).min())
+    return float(best)
+
+def reference_border_distances(geometries, densify_degrees=REFERENCE_DENSIFY_DEGREES, chunk=REFERENCE_CHUNK):
+    """
+    _reference_distance_km for every pair at once, plus where it is attained.
+    Returns (distances, own_points, other_points): (N, N) spherical
+    border-to-border km over boundaries densified to densify_degrees, and
+    (N, N, 2) lon/lat of the closest vertex on each side. Independent of the
+    pair tables, so it can serve as ground truth for them.
+
+    The search is exhaustive up to pruning: each boundary is cut into runs of
+    `chunk` consecutive vertices with a bounding cap (centre, angular radius),
+    and only run pairs whose caps could beat the best cap-to-cap upper bound
+    for that pair of countries are compared vertex by vertex.
+    """
+    geometries = np.asarray(list(geometries), dtype=object)
+    n = len(geometries)
+    boundaries = [shapely.get_coordinates(shapely.segmentize(geom.boundary, densify_degrees)) for geom in geometries]
+    coords = np.concatenate(boundaries)
+    lon, lat = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    vectors = np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+    offsets = np.concatenate(([0], np.cumsum([len(b) for b in boundaries])))
+    vertex_country = np.repeat(np.arange(n), np.diff(offsets))
+
+    # Runs of vertices, padded to `chunk` with -1, and their caps
+    starts = np.concatenate([np.arange(offsets[i], offsets[i + 1], chunk) for i in range(n)])
+    run_vertices = starts[:, None] + np.arange(chunk)
+    run_vertices[run_vertices >= offsets[vertex_country[starts] + 1][:, None]] = -1
+    run_country = vertex_country[starts]
+    run_offsets = np.searchsorted(run_country, np.arange(n + 1))
+    valid = run_vertices >= 0
+    members = vectors[np.where(valid, run_vertices, starts[:, None])]
+    centres = members.sum(axis=1)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    radii = np.where(valid, np.arccos(np.clip(np.einsum('rkc,rc->rk', members, centres), -1, 1)), 0).max(axis=1)
+
+    best = np.full((n, n), -2.0)
+    own_vertex = np.zeros((n, n), dtype=np.int64)
+    other_vertex = np.zeros((n, n), dtype=np.int64)
+    for row in range(n - 1):
+        # Only targets after row; the matrix is symmetric
+        own_runs = np.arange(run_offsets[row], run_offsets[row + 1])
+        other_runs = np.arange(run_offsets[row + 1], len(starts))
+        angles = np.arccos(np.clip(centres[own_runs] @ centres[other_runs].T, -1, 1))
+        reach = radii[own_runs][:, None] + radii[other_runs][None, :]
+        upper = np.minimum.reduceat((angles + reach).min(axis=0), run_offsets[row + 1:-1] - run_offsets[row + 1])
+        bound = upper[run_country[other_runs] - row - 1]
+
+        found_dot, found_own, found_other = [], [], []
+        for i, own_run in enumerate(own_runs):
+            survivors = other_runs[angles[i] - reach[i] <= bound]
+            if len(survivors) == 0:
+                continue
+            own = run_vertices[own_run][run_vertices[own_run] >= 0]
+            other = run_vertices[survivors].ravel()
+            other = other[other >= 0]
+            dots = vectors[own] @ vectors[other].T
+            closest = dots.argmax(axis=0)
+            found_dot.append(dots[closest, np.arange(len(other))])
+            found_own.append(own[closest])
+            found_other.append(other)
+        found_dot = np.concatenate(found_dot)
+        found_own = np.concatenate(found_own)
+        found_other = np.concatenate(found_other)
+
+        # Best vertex pair per target country
+        targets = vertex_country[found_other]
+        order = np.lexsort((-found_dot, targets))
+        first = order[np.r_[True, targets[order][1:] != targets[order][:-1]]]
+        cols = targets[first]
+        best[row, cols] = best[cols, row] = found_dot[first]
+        own_vertex[row, cols] = other_vertex[cols, row] = found_own[first]
+        other_vertex[row, cols] = own_vertex[cols, row] = found_other[first]
+
+    distances = np.arccos(np.clip(best, -1, 1)) * EARTH_RADIUS_KM
+    tree = shapely.STRtree(geometries)
+    left, right = tree.query(geometries, predicate='intersects')
+    distances[left, right] = 0
+    return distances, coords[own_vertex], coords[other_vertex]
+
+def compare_methods(world_frame, samples=200, reference_degrees=0.02, seed=0):
+    """Accuracy and cost of the planar and geodesic methods against a fine brute-force reference."""
+    from geometry import calculate_border_distances
+    geometries = np.asarray(list(world_frame.geometry), dtype=object)
+    n = len(geometries)
+
+    started = time.perf_counter()
+    planar = np.vstack([calculate_border_distances(geom, geometries) for geom in geometries])
+    planar_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    geodesic, _ = geodesic_border_distances(geometries)
+    geodesic_seconds = time.perf_counter() - started
+
+    rng = np.random.default_rng(seed)
+    pairs = rng.choice(n * n, size=min(samples, n * n), replace=False)
+    rows, cols = np.divmod(pairs, n)
+    keep = rows != cols
+    rows, cols = rows[keep], cols[keep]
+    reference = np.array([
+        _reference_distance_km(geometries[i], geometries[j], reference_degrees) for i, j in zip(rows, cols)
+    ])
+
+    report = {'pairs': len(rows), 'reference_densify_degrees': reference_degrees}
+    for name, table, seconds in (('planar', planar, planar_seconds), ('geodesic', geodesic, geodesic_seconds)):
+        error = np.abs(table[rows, cols] - reference)
+        report[name] = {
+            'table_seconds': seconds,
+            'mean_abs_error_km': float(error.mean()),
+            'p95_abs_error_km': float(np.percentile(error, 95)),
+            'max_abs_error_km': float(error.max()),
+        }
+    return report
+
+def main():
+    from world_store import read_world_data
+    report = compare_methods(read_world_data())
+    print(f"Sampled {report['pairs']} country pairs; reference: haversine over "
+          f"vertices densified to {report['reference_densify_degrees']} degrees")
+    for name in ('planar', 'geodesic'):
+        r = report[name]
+        print(f"{name:>9}: full table {r['table_seconds']:.2f} s, abs error mean {r['mean_abs_error_km']:.1f} km, "
+              f"p95 {r['p95_abs_error_km']:.1f} km, max {r['max_abs_error_km']:.1f} km")
+
+if __name__ == '__main__':
+    main()
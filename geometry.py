@@ -0,0 +1,86 @@
+# geometry.py
+"""Shapely helpers for the distance and direction clues between countries."""
+from shapely.ops import nearest_points
+from math import degrees, atan2
+import math
+import numpy as np
+import shapely
+from metrics import exact_geometry_operations
+
+DIRECTIONS = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
+
+def nearest_point_bearing(from_geom, to_geom):
+    """Planar bearing (degrees) between the closest points of two geometries"""
+    p1, p2 = nearest_points(from_geom, to_geom)
+    dx = p2.x - p1.x
+    dy = p2.y - p1.y
+    bearing = degrees(atan2(dx, dy))
+    return (bearing + 360) % 360
+
+def calculate_direction(from_geom, to_geom):
+    """Calculate direction between two country geometries using closest points"""
+    bearing = nearest_point_bearing(from_geom, to_geom)
+    index = round(bearing / 45) % 8
+    return DIRECTIONS[index]
+
+def calculate_border_distance(country1_geom, country2_geom):
+    """Calculate shortest distance between country borders in km"""
+    distance = country1_geom.distance(country2_geom)
+    return round(distance * 100 / 10) * 10
+
+# Functions for centroid-based calculations
+def get_centroid_coords(geometry):
+    """Calculate the centroid coordinates of a geometry. Returns (lat, lon)."""
+    centroid = geometry.centroid
+    return (centroid.y, centroid.x)
+
+def calculate_bearing(pointA, pointB):
+    """Calculate the bearing from pointA to pointB."""
+    lat1 = math.radians(pointA[0])
+    lat2 = math.radians(pointB[0])
+    diffLong = math.radians(pointB[1] - pointA[1])
+
+    x = math.sin(diffLong) * math.cos(lat2)
+    y = math.cos(lat1) * math.sin(lat2) - (
+        math.sin(lat1) * math.cos(lat2) * math.cos(diffLong)
+    )
+
+    initial_bearing = math.atan2(x, y)
+    initial_bearing = math.degrees(initial_bearing)
+    compass_bearing = (initial_bearing + 360) % 360
+    return compass_bearing
+
+def bearing_to_direction(bearing):
+    """Convert bearing to cardinal direction."""
+    idx = int((bearing + 22.5) % 360 / 45)
+    return DIRECTIONS[idx]
+
+# Vectorized equivalents, used to fill whole rows of the pair tables at once
+
+def nearest_bearings_to_octants(bearings):
+    """Octant indexes into DIRECTIONS, rounded the way calculate_direction does"""
+    return (np.round(bearings / 45) % 8).astype(np.int8)
+
+def calculate_border_distances(from_geom, geometries):
+    """calculate_border_distance from one geometry to an array of geometries"""
+    distances = shapely.distance(from_geom, geometries)
+    exact_geometry_operations.inc(len(geometries), operation='distance')
+    return (np.round(distances * 100 / 10) * 10).astype(np.int32)
+
+def calculate_bearings(pointA, points):
+    """calculate_bearing from one (lat, lon) point to an (N, 2) array of points"""
+    lat1 = np.radians(pointA[0])
+    lat2 = np.radians(points[:, 0])
+    diffLong = np.radians(points[:, 1] - pointA[1])
+
+    x = np.sin(diffLong) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - (
+        np.sin(lat1) * np.cos(lat2) * np.cos(diffLong)
+    )
+
+    initial_bearing = np.degrees(np.arctan2(x, y))
+    return np.mod(initial_bearing + 360, 360)
+
+def bearings_to_octants(bearings):
+    """Octant indexes into DIRECTIONS, binned the way bearing_to_direction does"""
+    return (np.mod(bearings + 22.5, 360) // 45).astype(np.int8)
@@ -0,0 +1,124 @@
+# loadgen.py
+"""
+Load generator: simulated players against a running server.
+
+Each player thread plays whole games over HTTP the way the browser does
+(/initialize-game, then /make-guess until the target is suggested), using
+clues predicted from the local pair tables. Reports throughput, the
+latency distribution and the 503/504 responses of the backpressure and
+timeout limits.
+
+    python serve.py &
+    python loadgen.py --url http://127.0.0.1:5000 --players 64 --duration 30
+"""
+import argparse
+import random
+import threading
+import time
+import numpy as np
+import requests
+from geometry import DIRECTIONS
+from solver import SOLVER_MODES, predicted_clues
+from world_store import get_world
+
+DEFAULT_MAX_GUESSES = 20
+
+def play(url, session, clues, names, rows, mode, rng, record, max_guesses=DEFAULT_MAX_GUESSES):
+    """One game between two random countries of rows; returns True if the target was reached."""
+    clue_km, clue_octant = clues
+    start, target = rng.sample(rows, 2)
+
+    def post(path, payload):
+        started = time.perf_counter()
+        try:
+            response = session.post(url + path, json=payload, timeout=60)
+        except requests.RequestException:
+            record(path, None, time.perf_counter() - started)
+            return None
+        record(path, response.status_code, time.perf_counter() - started)
+        return response.json() if response.status_code == 200 else None
+
+    if not post('/initialize-game', {'guess': names[start], 'mode': mode}):
+        return False
+    current = start
+    for _ in range(max_guesses):
+        distance = int(clue_km[current, target])
+        result = post('/make-guess', {
+            'guess': names[current],
+            'distance': f'{distance}km' if distance else '<10km',
+            'direction': DIRECTIONS[clue_octant[current, target]],
+        })
+        if not result or not result.get('success'):
+            return False
+        if 'neighboring_countries' in result:
+            return names[target] in [name.lower() for name in result['neighboring_countries']]
+        current = names.index(result['next_guess'].lower())
+        if names[current] == names[target]:
+            return True
+    return False
+
+def run_load(url, players, duration, mode='latest', seed=0):
+    tables = get_world().tables
+    rows = np.arange(len(tables))
+    clues = predicted_clues(tables, rows[:, None], rows[None, :])
+    names = tables.names.tolist()
+    game_rows = rows.tolist()
+
+    lock = threading.Lock()
+    samples = []
+    games = {'played': 0, 'solved': 0}
+
+    def record(path, status, seconds):
+        with lock:
+            samples.append((path, status, seconds))
+
+    deadline = time.perf_counter() + duration
+
+    def player(index):
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            solved = play(url, session, clues, names, game_rows, mode, rng, record)
+            with lock:
+                games['played'] += 1
+                games['solved'] += solved
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=player, args=(i,)) for i in range(players)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, games, time.perf_counter() - started
+
+def format_report(samples, games, elapsed, players):
+    latencies = np.array([seconds for _, _, seconds in samples]) * 1000
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[status] = statuses.get(status, 0) + 1
+    lines = [
+        f"Players: {players}  elapsed: {elapsed:.1f} s  games: {games['played']} (solved {games['solved']})",
+        f"Requests: {len(samples)}  throughput: {len(samples) / elapsed:.1f} req/s",
+        "Status codes: " + ', '.join(f"{status or 'error'}: {count}" for status, count in sorted(statuses.items(), key=str)),
+    ]
+    if len(latencies):
+        lines.append(
+            f"Latency: p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms, "
+            f"p99 {np.percentile(latencies, 99):.1f} ms, max {latencies.max():.1f} ms"
+        )
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate concurrent Globle players against a running server.')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--players', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30, help='seconds to keep starting games')
+    parser.add_argument('--mode', choices=SOLVER_MODES, default='latest')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    samples, games, elapsed = run_load(args.url.rstrip('/'), args.players, args.duration, args.mode, args.seed)
+    print(format_report(samples, games, elapsed, args.players))
+
+if __name__ == '__main__':
+    main()
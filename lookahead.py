@@ -0,0 +1,139 @@
+# lookahead.py
+"""
+Expert mode: one-step lookahead over every possible next guess.
+
+For a candidate set C, each country g (not only the survivors) is scored by
+the expected number of candidates left after guessing it, assuming the
+answer is uniform over C and the game reports the clue the pair tables
+predict for (g, answer). Scoring is O(N * |C|^2), so results are memoized
+per candidate set, and the first moves come from an opening book built
+offline by Distance/prepare_data.py.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+from functools import lru_cache
+from geometry import DIRECTIONS
+from solver import (
+    DISTANCE_TOLERANCE_KM, DISTANCE_TOLERANCE_RATIO, NEIGHBOR_KM,
+    initial_candidates, encode_candidates, decode_candidates,
+    predicted_clues, octants_near, clue_mask, clue_fit,
+)
+from metrics import timed
+
+OPENING_BOOK_FILENAME = 'opening_book.json'
+BEST_GUESS_CACHE_SIZE = 4096
+
+def expected_remaining(tables, candidates):
+    """Expected number of surviving candidates after guessing each row of the tables."""
+    targets = np.flatnonzero(candidates)
+    k = len(targets)
+    guesses = np.arange(len(tables))[:, None]
+
+    # Clue each (guess, target) pair would produce: (N, k)
+    clue_km, clue_octant = predicted_clues(tables, guesses, targets[None, :])
+    clue_km = clue_km[:, :, None]
+    clue_octant = clue_octant[:, :, None]
+
+    # Properties of every (guess, other candidate) pair the clue is tested against: (N, 1, k)
+    distance_km = tables.geodesic_km[guesses, targets][:, None, :]
+    touches = tables.touches[guesses, targets][:, None, :]
+    nearest_octant = tables.nearest_octant[guesses, targets][:, None, :]
+    centroid_octant = tables.centroid_octant[guesses, targets][:, None, :]
+    same_name = (tables.names[guesses] == tables.names[targets][None, :])
+
+    # Same test as solver.clue_mask, for all (guess, target, other) triples at once: (N, k, k)
+    tolerance = np.maximum(DISTANCE_TOLERANCE_KM, DISTANCE_TOLERANCE_RATIO * clue_km)
+    distance_ok = np.where(
+        clue_km == 0,
+        touches | (distance_km < NEIGHBOR_KM),
+        np.abs(distance_km - clue_km) <= tolerance,
+    )
+    direction_ok = octants_near(nearest_octant, clue_octant) | octants_near(centroid_octant, clue_octant)
+    consistent = distance_ok & direction_ok & ~same_name[:, None, :]
+
+    remaining = consistent.sum(axis=2)
+    # Guessing the answer itself ends the game with nothing left
+    remaining[same_name] = 0
+    return remaining.sum(axis=1) / k
+
+def rank_guesses(tables, candidates):
+    """Rows ordered best first: lowest expected remaining, then survivors, then table order."""
+    scores = expected_remaining(tables, candidates)
+    return np.lexsort((np.arange(len(tables)), ~candidates, scores))
+
+@lru_cache(maxsize=BEST_GUESS_CACHE_SIZE)
+def _best_guess(tables, encoded):
+    candidates = decode_candidates(encoded, len(tables))
+    return int(rank_guesses(tables, candidates)[0])
+
+@timed('best_guess')
+def best_guess(tables, candidates, opening_book=None):
+    """
+    Best next row for this candidate set, from the opening book if present,
+    otherwise from the memoized lookahead search.
+    """
+    rows = np.flatnonzero(candidates)
+    if len(rows) <= 1:
+        return int(rows[0]) if len(rows) else None
+    encoded = encode_candidates(candidates)
+    if opening_book and encoded in opening_book:
+        return tables.index_of(opening_book[encoded])
+    return _best_guess(tables, encoded)
+
+def best_guess_cache_info():
+    """functools hit/miss counters for the lookahead memo."""
+    return _best_guess.cache_info()
+
+def names_digest(names):
+    """Fingerprint of the country list a book or table was built for."""
+    return hashlib.sha1('\n'.join(names).encode('utf-8')).hexdigest()
+
+def build_opening_book(tables, depth=2):
+    """
+    Precompute the best guess for the full candidate set (move 1) and, for
+    depth=2, for every set constrained_guess can hand to best_guess after that
+    move's clue (move 2): the survivors tied for the best clue_fit.
+    """
+    full = initial_candidates(tables)
+    opening = best_guess(tables, full)
+    book = {encode_candidates(full): str(tables.names[opening])}
+
+    if depth >= 2:
+        distances, octants = predicted_clues(tables, opening, np.arange(len(tables)))
+        for target in range(len(tables)):
+            if tables.names[target] == tables.names[opening]:
+                continue
+            direction = DIRECTIONS[octants[target]]
+            remaining = clue_mask(tables, opening, distances[target], direction)
+            if not remaining.any():
+                continue
+            fit = clue_fit(tables, opening, distances[target], direction)
+            remaining &= fit == fit[remaining].min()
+            encoded = encode_candidates(remaining)
+            if encoded not in book and remaining.sum() > 1:
+                book[encoded] = str(tables.names[best_guess(tables, remaining)])
+    return book
+
+def save_opening_book(path, tables, book, stamp=None):
+    data = {'countries': names_digest(tables.names.tolist()), 'book': book}
+    if stamp:
+        data['build_stamp'] = stamp
+    with open(path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+
+def load_opening_book(path, tables):
+    """The saved book, or an empty one if it is missing (or path is None) or was built for other countries."""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"Could not read '{path}' ({e}), ignoring the opening book.")
+        return {}
+    if data.get('countries') != names_digest(tables.names.tolist()):
+        print(f"'{path}' does not match the loaded countries, ignoring the opening book.")
+        return {}
+    return data['book']
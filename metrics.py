@@ -0,0 +1,134 @@
+# metrics.py
+"""
+In-process metrics rendered in the Prometheus text format.
+
+    stage_seconds{stage}                   histogram of time spent per stage
+    exact_geometry_operations_total{operation}
+    exact_evaluations_per_query            histogram, exact distance measures per query
+    http_request_seconds{route, method, status}
+
+Code marks a stage with `with timed('stage'):` or `@timed('stage')`.
+Values owned by other modules (cache hit ratios, pool occupancy) are read at
+scrape time from functions registered with add_collector.
+"""
+import threading
+import time
+from functools import wraps
+
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(key)} {_format_value(value)}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets + (float('inf'),), state[:-2] + [state[-1]]):
+                    labels = _format_labels(key + (('le', _format_value(bound)),))
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(state[-2])}')
+                lines.append(f'{self.name}_count{_format_labels(key)} {state[-1]}')
+        return lines
+
+stage_seconds = Histogram('stage_seconds', 'Time spent in each stage of loading and solving.')
+exact_geometry_operations = Counter('exact_geometry_operations_total',
+                                    'Exact geometry operations (shapely predicates, geodesic measures).')
+exact_evaluations_per_query = Histogram('exact_evaluations_per_query',
+                                        'Exact distance evaluations performed by one exact search query.',
+                                        COUNT_BUCKETS)
+http_request_seconds = Histogram('http_request_seconds', 'Request handling time by route.')
+
+_metrics = [stage_seconds, exact_geometry_operations, exact_evaluations_per_query, http_request_seconds]
+_collectors = []
+
+class timed:
+    """Record the duration of a block or of every call of a function under stage_seconds{stage}."""
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stage_seconds.observe(time.perf_counter() - self._started, stage=self.stage)
+        return False
+
+    def __call__(self, fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stage_seconds.observe(time.perf_counter() - started, stage=self.stage)
+        return wrapper
+
+def add_collector(collect):
+    """
+    collect() returns a list of (name, type, help, [(labels dict, value), ...])
+    and is called on every scrape.
+    """
+    _collectors.append(collect)
+
+def render():
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        for name, kind, help_text, samples in collect():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,158 @@
+# pair_tables.py
+"""
+All-pairs country relationship tables.
+
+Distance/prepare_data.py builds these offline into countries_pairs.npz next
+to countries.geojson, so the solver can answer a guess by indexing arrays
+instead of running shapely operations per request. Row and column i of every
+table refer to the i-th country of the GeoJSON.
+"""
+import numpy as np
+import os
+import shapely
+from compact_geometry import CompactGeometry
+from geometry import (
+    nearest_bearings_to_octants, calculate_border_distances, calculate_bearings, bearings_to_octants,
+)
+from geodesic import geodesic_border_distances
+
+PAIR_TABLES_FILENAME = 'countries_pairs.npz'
+
+class PairTables:
+    """
+    NxN clue tables for a fixed list of countries.
+
+    geodesic_km       border-to-border distance in km on the WGS84 ellipsoid (see geodesic.py)
+    border_km         legacy planar estimate, as calculate_border_distance
+    nearest_bearing   geodesic azimuth between the closest border points (see geodesic.py)
+    nearest_octant    index into DIRECTIONS, rounded as calculate_direction
+    centroid_bearing  bearing between centroids, as calculate_bearing
+    centroid_octant   index into DIRECTIONS, as bearing_to_direction
+    touches           True where the two countries share a border
+    """
+
+    ARRAYS = ('names', 'centroids', 'geodesic_km', 'border_km', 'nearest_bearing', 'nearest_octant',
+              'centroid_bearing', 'centroid_octant', 'touches')
+
+    def __init__(self, names, centroids, geodesic_km, border_km, nearest_bearing,
+                 nearest_octant, centroid_bearing, centroid_octant, touches):
+        self.names = np.asarray(names)
+        self.centroids = centroids
+        self.geodesic_km = geodesic_km
+        self.border_km = border_km
+        self.nearest_bearing = nearest_bearing
+        self.nearest_octant = nearest_octant
+        self.centroid_bearing = centroid_bearing
+        self.centroid_octant = centroid_octant
+        self.touches = touches
+        # Per-country neighbour rows, so <10km answers never scan the bitmap
+        self.adjacency = [np.flatnonzero(row) for row in touches]
+        # Distance/prepare_data.py refuses to build data with repeated names
+        self.row_of = {name: i for i, name in enumerate(self.names.tolist())}
+        if len(self.row_of) != len(self.names):
+            raise ValueError('Country names in the pair tables must be unique')
+
+    def __len__(self):
+        return len(self.names)
+
+    def index_of(self, name):
+        """Return the row of a (case-insensitive) country name."""
+        try:
+            return self.row_of[name.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown country '{name}'") from None
+
+    def matches(self, names):
+        """True if these tables were built for exactly this list of countries."""
+        return self.names.tolist() == list(names)
+
+    def save(self, path, stamp=None):
+        """Compressed npz; stamp is the build stamp recorded by Distance/prepare_data.py."""
+        extra = {'build_stamp': np.str_(stamp)} if stamp else {}
+        np.savez_compressed(
+            path,
+            names=self.names,
+            centroids=self.centroids,
+            geodesic_km=self.geodesic_km,
+            border_km=self.border_km,
+            nearest_bearing=self.nearest_bearing,
+            nearest_octant=self.nearest_octant,
+            centroid_bearing=self.centroid_bearing,
+            centroid_octant=self.centroid_octant,
+            touches=np.packbits(self.touches, axis=1),
+            **extra,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            n = len(data['names'])
+            return cls(
+                names=data['names'],
+                centroids=data['centroids'],
+                geodesic_km=data['geodesic_km'],
+                border_km=data['border_km'],
+                nearest_bearing=data['nearest_bearing'],
+                nearest_octant=data['nearest_octant'],
+                centroid_bearing=data['centroid_bearing'],
+                centroid_octant=data['centroid_octant'],
+                touches=np.unpackbits(data['touches'], axis=1, count=n).astype(bool),
+            )
+
+    def save_arrays(self, directory):
+        """Write every table as an uncompressed .npy file, so other processes can memory-map them."""
+        for field in self.ARRAYS:
+            np.save(os.path.join(directory, f'{field}.npy'), getattr(self, field))
+
+    @classmethod
+    def load_arrays(cls, directory, mmap_mode='r'):
+        """Open tables written by save_arrays without copying them into this process."""
+        return cls(**{
+            field: np.load(os.path.join(directory, f'{field}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+            for field in cls.ARRAYS
+        })
+
+def build_pair_tables(names, geometries, compact=None):
+    """Run the exact shapely clue calculations once for every pair of countries."""
+    names = [name.lower() for name in names]
+    geometries = np.asarray(list(geometries), dtype=object)
+    n = len(geometries)
+    if compact is None:
+        compact = CompactGeometry.from_geometries(geometries)
+
+    centroids = compact.centroids
+    border_km = np.zeros((n, n), dtype=np.int32)
+    centroid_bearing = np.zeros((n, n), dtype=np.float32)
+    centroid_octant = np.zeros((n, n), dtype=np.int8)
+    touches = np.zeros((n, n), dtype=bool)
+
+    # Bounding-box prefilter from the spatial index, exact touches test on the survivors
+    tree = shapely.STRtree(geometries)
+    left, right = tree.query(geometries, predicate='touches')
+    touches[left, right] = True
+
+    for i, from_geom in enumerate(geometries):
+        border_km[i] = calculate_border_distances(from_geom, geometries)
+        bearings = calculate_bearings(centroids[i], centroids)
+        centroid_bearing[i] = bearings
+        centroid_octant[i] = bearings_to_octants(bearings)
+
+    geodesic_km, nearest_bearing = geodesic_border_distances(geometries, compact=compact)
+    geodesic_km = geodesic_km.astype(np.float32)
+    nearest_bearing = nearest_bearing.astype(np.float32)
+    nearest_octant = nearest_bearings_to_octants(nearest_bearing)
+
+    return PairTables(names, centroids, geodesic_km, border_km, nearest_bearing,
+                      nearest_octant, centroid_bearing, centroid_octant, touches)
+
+def load_or_build_pair_tables(path, names, geometries, compact=None):
+    """Load the prebuilt tables (path None skips them), rebuilding them in-process if missing or stale."""
+    if path and os.path.exists(path):
+        try:
+            tables = PairTables.load(path)
+            if tables.matches(names):
+                return tables
+            print(f"'{path}' does not match the loaded countries, rebuilding pair tables.")
+        except Exception as e:
+            print(f"Could not read '{path}' ({e}), rebuilding pair tables.")
+    return build_pair_tables(names, geometries, compact)
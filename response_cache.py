@@ -0,0 +1,111 @@
+# response_cache.py
+"""
+Memoized latest-mode answers.
+
+In latest mode the answer to a clue depends only on the current country,
+the distance and the direction, and the same openings and clues come up
+for many players. GuessCache is a bounded LRU in front of the solver keyed
+by (country row, distance bucket, direction).
+
+Distances are rounded to DISTANCE_BUCKET_KM before solving, so a cached
+answer is exactly what the solver returns for its key. The game's borders
+differ from ours by far more than half a bucket.
+
+Constrained and expert games depend on the whole clue history and are not
+cached here.
+"""
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from solver import find_best_guess, neighbors_in_direction, predicted_clues
+
+DISTANCE_BUCKET_KM = 10
+DEFAULT_MAX_ENTRIES = 65536
+
+def bucket_distance(distance):
+    """Round to DISTANCE_BUCKET_KM; 0 (<10km) stays 0 and nothing else rounds down to it."""
+    if distance == 0:
+        return 0
+    return max(DISTANCE_BUCKET_KM, int(round(distance / DISTANCE_BUCKET_KM)) * DISTANCE_BUCKET_KM)
+
+def latest_answer(world, current_country, distance, direction):
+    """The /make-guess response for a latest-mode clue, uncached."""
+    if distance == 0:
+        return neighbors_in_direction(world, current_country, direction)
+    next_guess = find_best_guess(world, current_country, distance, direction)
+    if next_guess is None:
+        return {
+            'success': False,
+            'message': 'Could not find a suitable next guess. Please check the inputs.'
+        }
+    return {
+        'success': True,
+        'next_guess': next_guess
+    }
+
+class GuessCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._world = None
+        self._lock = threading.Lock()
+
+    def answer(self, world, current_country, distance, direction):
+        """latest_answer for the bucketed distance, from the cache when possible."""
+        distance = bucket_distance(distance)
+        key = (world.tables.index_of(current_country), distance, direction)
+        with self._lock:
+            # A reloaded world invalidates everything
+            if world is not self._world:
+                self._entries.clear()
+                self._world = world
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(result)
+            self.misses += 1
+
+        result = latest_answer(world, current_country, distance, direction)
+        with self._lock:
+            if world is self._world:
+                self._entries[key] = result
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return dict(result)
+
+    def find_best_guess(self, world, current_country, distance, direction):
+        """Cached drop-in for solver.find_best_guess."""
+        return self.answer(world, current_country, distance, direction).get('next_guess')
+
+    def info(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def prewarm(self, world, starts=None):
+        """
+        Fill the cache with every clue of the latest-mode benchmark replay,
+        using the clues predicted from the loaded pair tables.
+        """
+        from benchmark import run_benchmark
+        rows = np.arange(len(world.tables))
+        clues = predicted_clues(world.tables, rows[:, None], rows[None, :])
+        run_benchmark(world, 'latest', starts, clues=clues, find_guess=self.find_best_guess)
+        return self.info()
+
+guess_cache = GuessCache(int(os.environ.get('GUESS_CACHE_SIZE', DEFAULT_MAX_ENTRIES)))
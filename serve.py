@@ -0,0 +1,106 @@
+# serve.py
+"""
+Production serving mode.
+
+    python serve.py --port 5000
+    uvicorn serve:asgi_app --host 0.0.0.0 --port 5000
+
+asgi_app wraps the Flask app for an ASGI server: the event loop accepts
+connections and each request runs on one of REQUEST_THREADS threads, so a
+slow request no longer blocks every other player. Inside the routes the
+CPU-bound solver calls go to the bounded solver_pool (SOLVER_THREADS,
+SOLVER_MAX_PENDING, SOLVER_TIMEOUT), which answers 503 when it is full and
+504 when a call takes too long.
+
+The app and world data are loaded by the ASGI lifespan startup (or by
+main() for Flask's server) before the first request is accepted, not on
+import, so the spawned batch workers that re-import this module stay
+light. With more than one worker process, set GAME_STORE=sqlite:<path> so
+every process sees the same games.
+
+uvicorn and a2wsgi are optional; without them python serve.py falls back
+to Flask's threaded server.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+
+try:
+    import uvicorn
+    from a2wsgi import WSGIMiddleware
+except ImportError:  # Optional serving dependencies
+    uvicorn = None
+    WSGIMiddleware = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REQUEST_THREADS = int(os.environ.get('REQUEST_THREADS', 32))
+
+def load_app_module():
+    """'app(older).py' is not an importable module name, so load it from its path."""
+    spec = importlib.util.spec_from_file_location('globle_app', os.path.join(BASE_DIR, 'app(older).py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def get_app_module():
+    """
+    The app module, loaded on first use. Nothing is loaded at import time:
+    batch workers are spawned processes that re-import the main module.
+    """
+    module = sys.modules.get('globle_app')
+    return module if module is not None else load_app_module()
+
+def warm_up():
+    """Load the app and the world (and optionally fill the guess cache) before serving."""
+    app_module = get_app_module()
+    world = app_module.world_store.load()
+    print(f"Loaded world data from {app_module.world_store.source}")
+    if os.environ.get('GUESS_CACHE_PREWARM', '').lower() in ('1', 'true', 'yes'):
+        info = app_module.guess_cache.prewarm(world)
+        print(f"Prewarmed the guess cache with {info['size']} answers")
+    return app_module.app
+
+_wsgi_app = None
+
+async def asgi_app(scope, receive, send):
+    """
+    ASGI entry point. The lifespan startup event warms up the app, so an
+    ASGI server loads everything once, before it accepts connections.
+    """
+    global _wsgi_app
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    _wsgi_app = WSGIMiddleware(warm_up(), workers=REQUEST_THREADS)
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    # Servers run with the lifespan protocol off warm up on the first request instead
+    if _wsgi_app is None:
+        _wsgi_app = WSGIMiddleware(warm_up(), workers=REQUEST_THREADS)
+    await _wsgi_app(scope, receive, send)
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the Globle solver.')
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--threaded', action='store_true', help="use Flask's threaded server even if uvicorn is installed")
+    args = parser.parse_args()
+
+    if uvicorn is not None and WSGIMiddleware is not None and not args.threaded:
+        uvicorn.run(asgi_app, host=args.host, port=args.port, log_level='warning')
+    else:
+        app = warm_up()
+        print("Serving with Flask's threaded server")
+        app.run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# site_bundle.py
+"""
+Data bundle for the static site in docs/.
+
+The page used to fetch the full pretty-printed countries.geojson and run
+turf centroids and booleanTouches for every guess. The bundle carries only
+what answering a clue needs, precomputed by Distance/prepare_data.py from
+the same pair tables the server uses:
+
+    names            in the header, one per row
+    centroids        (N, 2) float32  centroid (lat, lon)
+    distance         (N, N) uint16   geodesic border distance * DISTANCE_SCALE, rounded
+    octants          (N, N) uint8    nearest-border octant | centroid octant << 4
+    adjacency_offsets, adjacency     bordering rows, CSR layout
+    coords           (T, 2) int16    simplified vertices (lon, lat) * COORD_SCALE
+    ring_offsets, country_rings      as in CompactGeometry
+
+File layout: b'GLB1', a little-endian uint32 header length, the JSON
+header ({'version', 'build_stamp', 'names', 'arrays': {name: {dtype, shape, offset}}})
+and then each array, little-endian, at a 4-byte aligned offset from the
+start of the file.
+"""
+import json
+import struct
+import numpy as np
+
+SITE_BUNDLE_FILENAME = 'countries.bin'
+SITE_BUNDLE_MAGIC = b'GLB1'
+SITE_BUNDLE_VERSION = 1
+COORD_SCALE = 100
+# Half-kilometre steps keep the page's choices in line with the server's and still fit uint16
+DISTANCE_SCALE = 2
+
+def site_arrays(tables, compact):
+    """The bundle's arrays, in file order."""
+    adjacency_offsets = np.concatenate(([0], np.cumsum([len(rows) for rows in tables.adjacency])))
+    simplified = compact.simplified()
+    return {
+        'centroids': tables.centroids.astype('<f4'),
+        'distance': np.minimum(np.round(tables.geodesic_km * DISTANCE_SCALE), np.iinfo(np.uint16).max).astype('<u2'),
+        'octants': (tables.nearest_octant.astype(np.uint8) | (tables.centroid_octant.astype(np.uint8) << 4)),
+        'adjacency_offsets': adjacency_offsets.astype('<u4'),
+        'adjacency': np.concatenate(tables.adjacency).astype('<u2'),
+        'coords': np.round(simplified.coords * COORD_SCALE).astype('<i2'),
+        'ring_offsets': simplified.ring_offsets.astype('<u4'),
+        'country_rings': simplified.country_rings.astype('<u4'),
+    }
+
+def write_site_bundle(path, tables, compact, stamp=None):
+    arrays = site_arrays(tables, compact)
+    specs = {name: {'dtype': array.dtype.str.lstrip('<|'), 'shape': list(array.shape)} for name, array in arrays.items()}
+
+    # Offsets depend on the header length, and the header holds the offsets: lay out until stable
+    header_size = 0
+    while True:
+        offset = len(SITE_BUNDLE_MAGIC) + 4 + header_size
+        for name, array in arrays.items():
+            offset += -offset % 4
+            specs[name]['offset'] = offset
+            offset += array.nbytes
+        header = json.dumps({
+            'version': SITE_BUNDLE_VERSION,
+            'coord_scale': COORD_SCALE,
+            'distance_scale': DISTANCE_SCALE,
+            'build_stamp': stamp,
+            'names': tables.names.tolist(),
+            'arrays': specs,
+        }, separators=(',', ':')).encode()
+        if len(header) == header_size:
+            break
+        header_size = len(header)
+
+    with open(path, 'wb') as f:
+        f.write(SITE_BUNDLE_MAGIC + struct.pack('<I', len(header)) + header)
+        for name, array in arrays.items():
+            f.write(b'\0' * (specs[name]['offset'] - f.tell()))
+            f.write(array.tobytes())
+    return path
+
+def read_site_bundle(path):
+    """(header, arrays) of a bundle, for checks from Python."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != SITE_BUNDLE_MAGIC:
+        raise ValueError(f"'{path}' is not a site bundle")
+    (header_size,) = struct.unpack('<I', data[4:8])
+    header = json.loads(data[8:8 + header_size])
+    arrays = {
+        name: np.frombuffer(data, dtype='<' + spec['dtype'], count=int(np.prod(spec['shape'])),
+                            offset=spec['offset']).reshape(spec['shape'])
+        for name, spec in header['arrays'].items()
+    }
+    return header, arrays
@@ -0,0 +1,201 @@
+# solver.py
+"""
+Vectorized Globle solver.
+
+Every clue between two countries is already in the pair tables, so choosing
+the next guess is a handful of NumPy operations over one table row: build a
+mask of candidates whose octant matches the reported direction, then take
+the argmin of the distance difference under that mask.
+"""
+import math
+import numpy as np
+from geometry import DIRECTIONS
+from metrics import timed
+
+# 'latest' answers from the most recent clue only, 'constrained' keeps every clue of the game,
+# 'expert' also keeps every clue and picks the guess with the best one-step lookahead
+SOLVER_MODES = ('latest', 'constrained', 'expert')
+
+def parse_distance(distance_str):
+    """Parse distance input, handling '<10km' case"""
+    if distance_str.strip().lower() == '<10km' or distance_str.strip().lower() == '<10':
+        return 0
+    try:
+        distance = float(distance_str)
+    except ValueError:
+        raise ValueError("Invalid distance format. Please use a number or '<10km'")
+    # float() also accepts 'nan', 'inf' and overflows like '1e400'
+    if not math.isfinite(distance):
+        raise ValueError("Invalid distance format. Please use a number or '<10km'")
+    return distance
+
+@timed('neighbors_in_direction')
+def neighbors_in_direction(world, current_country, target_direction):
+    """
+    Answer a <10km clue: the countries bordering current_country whose centroid
+    lies in the given direction, from the cached adjacency lists.
+
+    Returns {'success': True, 'neighboring_countries': [...]} or
+    {'success': False, 'message': ...}, the shape /make-guess responds with.
+    """
+    tables = world.tables
+    current = tables.index_of(current_country)
+    target_octant = DIRECTIONS.index(target_direction)
+    neighbors = tables.adjacency[current]
+
+    if len(neighbors) == 0:
+        return {
+            'success': False,
+            'message': f"No neighboring countries found for '{current_country}'."
+        }
+
+    matching = neighbors[tables.centroid_octant[current, neighbors] == target_octant]
+    if len(matching) == 0:
+        return {
+            'success': False,
+            'message': f"No bordering countries found to the {target_direction} of '{current_country}' within <10km."
+        }
+    return {
+        'success': True,
+        'neighboring_countries': [name.title() for name in tables.names[matching].tolist()]
+    }
+
+def best_match(distance_diff, mask):
+    """Row with the smallest distance difference under mask (first one on ties), or None."""
+    if not mask.any():
+        return None
+    return int(np.argmin(np.where(mask, distance_diff, np.inf)))
+
+@timed('find_best_guess')
+def find_best_guess(world, current_country, target_distance, target_direction):
+    """
+    Find the best next guess based on distance and direction.
+    The border-based direction is tried first; if no country matches it the
+    centroid-based direction is used as a fallback.
+    For a <10km clue this is the first matching neighbour; callers that want
+    the whole list should use neighbors_in_direction.
+    """
+    tables = world.tables
+    current = tables.index_of(current_country)
+    target_octant = DIRECTIONS.index(target_direction)
+    
+    # Handle neighboring countries case (<10km)
+    if target_distance == 0:
+        result = neighbors_in_direction(world, current_country, target_direction)
+        return result['neighboring_countries'][0] if result['success'] else None
+    
+    candidates = tables.names != tables.names[current]
+    distance_diff = np.abs(tables.geodesic_km[current] - target_distance)
+
+    # First attempt: border-based direction, then fall back to centroid-based direction
+    for octants in (tables.nearest_octant[current], tables.centroid_octant[current]):
+        best = best_match(distance_diff, candidates & (octants == target_octant))
+        if best is not None:
+            return tables.names[best].title()
+    return None
+
+# Constraint-accumulating solver: instead of using only the latest clue, a
+# game keeps a bitset of the countries that are consistent with every clue so
+# far and picks the survivor that fits the latest clue best.
+
+# The game's borders are drawn at a different resolution than ours, so a clue
+# accepts any country whose table distance is within
+# max(DISTANCE_TOLERANCE_KM, DISTANCE_TOLERANCE_RATIO * d).
+DISTANCE_TOLERANCE_KM = 150
+DISTANCE_TOLERANCE_RATIO = 0.1
+# The game reports anything closer than this as <10km
+NEIGHBOR_KM = 10
+# Our closest points and centroids are not the game's either, so a clue's direction
+# also accepts the octants this many steps to either side
+DIRECTION_SLACK_OCTANTS = 1
+# clue_fit ranks a worse direction match behind any distance difference on Earth
+FIT_RANK_KM = 100000
+
+def initial_candidates(tables):
+    """Every country is possible before the first clue."""
+    return np.ones(len(tables), dtype=bool)
+
+def encode_candidates(candidates):
+    """Pack a candidate mask into a short hex string (one bit per country) for the session."""
+    return np.packbits(candidates).tobytes().hex()
+
+def decode_candidates(encoded, n):
+    """Inverse of encode_candidates for a world of n countries."""
+    packed = np.frombuffer(bytes.fromhex(encoded), dtype=np.uint8)
+    return np.unpackbits(packed, count=n).astype(bool)
+
+def predicted_clues(tables, guess, targets):
+    """
+    The (distance, octant) clues guessing this row would give for each target
+    row, under the table model: neighbours report <10km (0) with the centroid
+    direction, everything else the border distance and border direction.
+    """
+    distance_km = tables.geodesic_km[guess, targets]
+    adjacent = tables.touches[guess, targets] | (distance_km < NEIGHBOR_KM)
+    distances = np.where(adjacent, 0, np.round(distance_km))
+    octants = np.where(adjacent, tables.centroid_octant[guess, targets], tables.nearest_octant[guess, targets])
+    return distances, octants
+
+def octants_near(octants, target_octant, slack=DIRECTION_SLACK_OCTANTS):
+    """True where an octant is within slack steps of target_octant, around the compass."""
+    steps = np.abs(octants.astype(np.int16) - target_octant) % 8
+    return np.minimum(steps, 8 - steps) <= slack
+
+def clue_mask(tables, guess, target_distance, target_direction):
+    """Countries that could have produced this (distance, direction) clue for the guessed row."""
+    target_octant = DIRECTIONS.index(target_direction)
+    # The game reports one direction; accept it if either of our two direction models is close
+    direction_ok = (octants_near(tables.nearest_octant[guess], target_octant)
+                    | octants_near(tables.centroid_octant[guess], target_octant))
+
+    distance_km = tables.geodesic_km[guess]
+    if target_distance == 0:
+        distance_ok = tables.touches[guess] | (distance_km < NEIGHBOR_KM)
+    else:
+        tolerance = max(DISTANCE_TOLERANCE_KM, DISTANCE_TOLERANCE_RATIO * target_distance)
+        distance_ok = np.abs(distance_km - target_distance) <= tolerance
+
+    # A clue means the guess itself was wrong
+    return direction_ok & distance_ok & (tables.names != tables.names[guess])
+
+def clue_fit(tables, guess, target_distance, target_direction):
+    """
+    How well each row fits a clue about the guessed row, lower is better:
+    an exact border-direction match, then an exact centroid-direction match,
+    then a neighbouring octant, each ordered by distance difference. A <10km
+    clue only has the centroid direction to go by.
+    """
+    target_octant = DIRECTIONS.index(target_direction)
+    centroid_rank = np.where(tables.centroid_octant[guess] == target_octant, 0, 1)
+    if target_distance == 0:
+        return centroid_rank * float(FIT_RANK_KM)
+    rank = np.where(tables.nearest_octant[guess] == target_octant, 0, 1 + centroid_rank)
+    return rank * FIT_RANK_KM + np.abs(tables.geodesic_km[guess] - target_distance)
+
+def first_row(tables, candidates):
+    """Lowest candidate row."""
+    return int(np.argmax(candidates))
+
+@timed('constrained_guess')
+def constrained_guess(world, candidates, current_country, target_distance, target_direction,
+                      choose=first_row):
+    """
+    Intersect the game's candidates with the latest clue and pick the next guess.
+
+    Returns (next_guess, candidates). If the clues contradict each other (usually
+    a mistyped clue), the history is dropped and only the latest clue is kept.
+    The guess is the survivor that fits the latest clue best (clue_fit);
+    choose(tables, tied) picks among the survivors tied for the best fit.
+    """
+    tables = world.tables
+    guess = tables.index_of(current_country)
+    latest = clue_mask(tables, guess, target_distance, target_direction)
+
+    remaining = candidates & latest
+    if not remaining.any():
+        remaining = latest
+    if not remaining.any():
+        return None, remaining
+    fit = clue_fit(tables, guess, target_distance, target_direction)
+    best = choose(tables, remaining & (fit == fit[remaining].min()))
+    return tables.names[best].title(), remaining
@@ -0,0 +1,70 @@
+# solver_pool.py
+"""
+Bounded pool for the CPU-bound solver calls made by the routes.
+
+Request threads hand solver work to SolverPool.run and wait for it, so at
+most `workers` solver calls run at once however many requests the server
+accepts. At most `max_pending` calls may be running or queued; beyond that
+run raises PoolBusy straight away (the routes answer 503) instead of letting
+the queue and every player's latency grow. A call that takes longer than
+`timeout` seconds raises SolverTimeout (504); it keeps its slot until it
+actually finishes, so a backlog of slow calls still counts against
+max_pending.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+class PoolBusy(Exception):
+    pass
+
+class SolverTimeout(Exception):
+    pass
+
+class SolverPool:
+    def __init__(self, workers=None, max_pending=None, timeout=10.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._in_flight = 0
+        self._count_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='solver')
+
+    def run(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) on a pool thread, subject to backpressure and the timeout."""
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusy(f'Solver is busy ({self.max_pending} requests pending). Please retry shortly.')
+        self._add_in_flight(1)
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise SolverTimeout(f'Solver did not answer within {self.timeout:g} s.')
+
+    def _add_in_flight(self, amount):
+        with self._count_lock:
+            self._in_flight += amount
+
+    def _release(self):
+        self._add_in_flight(-1)
+        self._slots.release()
+
+    @property
+    def in_flight(self):
+        """Solver calls running or queued right now."""
+        return self._in_flight
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+solver_pool = SolverPool(
+    workers=int(os.environ.get('SOLVER_THREADS', 0)) or None,
+    max_pending=int(os.environ.get('SOLVER_MAX_PENDING', 0)) or None,
+    timeout=float(os.environ.get('SOLVER_TIMEOUT', 10)),
+)
@@ -0,0 +1,172 @@
+# world_store.py
+"""
+Process-wide store for the world geometry used by the Globle solver.
+
+The geometry is loaded once from the bundled Distance/countries.geojson
+artifact (produced by Distance/prepare_data.py), together with the pair
+tables in Distance/countries_pairs.npz. Downloading the Natural Earth zip is
+only used as a fallback when the local artifact is missing or unreadable.
+Derived artifacts whose build stamps disagree with build_manifest.json are
+not loaded but rebuilt in memory.
+"""
+import geopandas as gpd
+import requests
+import tempfile
+import os
+import threading
+from country_names import VALID_COUNTRIES, INPUT_FUZZY_CUTOFF, CountryNameIndex, unify_country_name
+from compact_geometry import SHAPES_FILENAME, load_or_build_compact_geometry
+from pair_tables import PAIR_TABLES_FILENAME, load_or_build_pair_tables
+from lookahead import OPENING_BOOK_FILENAME, load_opening_book
+from metrics import timed
+from artifacts import stale_artifacts
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'Distance')
+DEFAULT_WORLD_DATA_PATH = os.path.join(DATA_DIR, 'countries.geojson')
+WORLD_DATA_URL = "https://naciscdn.org/naturalearth/110m/cultural/ne_110m_admin_0_countries.zip"
+
+def _finalize_world_data(world):
+    """Keep only the columns the solver needs, with a positional index."""
+    world = world[world.name_lower.isin(VALID_COUNTRIES)]
+    world = world[~world.geometry.is_empty]
+    return world[['name_lower', 'geometry']].reset_index(drop=True)
+
+def download_world_data():
+    """Download and normalize the Natural Earth 110m countries (network fallback)."""
+    temp_dir = tempfile.mkdtemp()
+    temp_file = os.path.join(temp_dir, "world.zip")
+
+    print("Downloading world map data...")
+    try:
+        with timed('download'):
+            response = requests.get(WORLD_DATA_URL, timeout=30)
+            response.raise_for_status()
+        with open(temp_file, 'wb') as f:
+            f.write(response.content)
+
+        with timed('read_file'):
+            world = gpd.read_file(f"zip://{temp_file}")
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        os.rmdir(temp_dir)
+
+    with timed('normalize_names'):
+        world['name_lower'] = world['NAME'].apply(unify_country_name)
+    return _finalize_world_data(world)
+
+def read_world_data(path=DEFAULT_WORLD_DATA_PATH):
+    """Read the bundled GeoJSON artifact written by Distance/prepare_data.py."""
+    with timed('read_file'):
+        world = gpd.read_file(path)
+    world['name_lower'] = world['name'].str.lower()
+    return _finalize_world_data(world)
+
+class World:
+    """
+    Everything derived from one load of the world data.
+
+    frame         GeoDataFrame with 'name_lower' and 'geometry', positionally indexed
+                  (None in table-only worlds such as batch workers)
+    tables        PairTables whose rows line up with the frame
+    source        path or URL the geometry was read from
+    opening_book  expert-mode book, encoded candidate set -> country name
+    name_index    CountryNameIndex over the table rows, for user input
+    compact       CompactGeometry (array-backed centroids, bounds and vertices)
+    """
+
+    def __init__(self, frame, tables, source, opening_book=None, compact=None):
+        self.frame = frame
+        self.tables = tables
+        self.source = source
+        self.opening_book = opening_book or {}
+        self.name_index = CountryNameIndex(tables.names.tolist(), cutoff=INPUT_FUZZY_CUTOFF)
+        self.compact = compact
+
+    @timed('resolve_name')
+    def resolve(self, text):
+        """Canonical lowercase name for a user-entered name, alias or ISO code, or None."""
+        return self.name_index.canonical(text)
+
+class WorldStore:
+    """
+    Holds one World per process.
+
+    The data is loaded lazily on first access (or eagerly via load()), and
+    can be swapped out at runtime with reload(). Readers always see either
+    the old or the new World, never a partially loaded one.
+    """
+
+    def __init__(self, path=DEFAULT_WORLD_DATA_PATH, allow_download=True):
+        self.path = path
+        self.pair_tables_path = os.path.join(os.path.dirname(path), PAIR_TABLES_FILENAME)
+        self.opening_book_path = os.path.join(os.path.dirname(path), OPENING_BOOK_FILENAME)
+        self.shapes_path = os.path.join(os.path.dirname(path), SHAPES_FILENAME)
+        self.allow_download = allow_download
+        self._world = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            frame = read_world_data(self.path)
+            source = self.path
+        except Exception as e:
+            if not self.allow_download:
+                raise
+            print(f"Could not read '{self.path}' ({e}), falling back to download.")
+            frame = download_world_data()
+            source = WORLD_DATA_URL
+        stale = stale_artifacts(os.path.dirname(self.path), [
+            os.path.basename(path) for path in (self.shapes_path, self.pair_tables_path, self.opening_book_path)
+        ]) if source == self.path else set()
+        usable = lambda path: None if os.path.basename(path) in stale else path
+        with timed('compact_geometry'):
+            compact = load_or_build_compact_geometry(usable(self.shapes_path), frame.name_lower, frame.geometry)
+        with timed('pair_tables'):
+            tables = load_or_build_pair_tables(usable(self.pair_tables_path), frame.name_lower, frame.geometry, compact)
+        with timed('opening_book'):
+            opening_book = load_opening_book(usable(self.opening_book_path), tables)
+        return World(frame, tables, source, opening_book, compact)
+
+    def load(self):
+        """Load the world data if it has not been loaded yet and return it."""
+        world = self._world
+        if world is not None:
+            return world
+        with self._lock:
+            if self._world is None:
+                self._world = self._load()
+            return self._world
+
+    def reload(self):
+        """Re-read the world data from its source and replace the cached copy."""
+        world = self._load()
+        with self._lock:
+            self._world = world
+        return world
+
+    @property
+    def loaded(self):
+        return self._world is not None
+
+    @property
+    def source(self):
+        return self._world.source if self._world is not None else None
+
+world_store = WorldStore(
+    path=os.environ.get('WORLD_DATA_PATH', DEFAULT_WORLD_DATA_PATH),
+    allow_download=os.environ.get('WORLD_DATA_ALLOW_DOWNLOAD', '1') != '0',
+)
+
+def get_world():
+    """Return the process-wide World, loading it on first use."""
+    return world_store.load()
+
+def get_world_data():
+    """Return the process-wide world GeoDataFrame, loading it on first use."""
+    return world_store.load().frame
+
+def reload_world_data():
+    """Refresh the process-wide world data from disk (or the network)."""
+    return world_store.reload()